@@ -4,12 +4,25 @@ import numpy as np
 import matplotlib.pyplot as plt
 import io
 import os
+import itertools
+import json
 # 导入中文字体配置
 import font_config
 from data_processor import (
     calculate_statistics, generate_histogram, generate_boxplot,
-    calculate_parameter_estimates, calculate_correlation
+    calculate_parameter_estimates, calculate_correlation, summarize_statistics,
+    generate_histogram_from_counts
 )
+from rolling_analysis import analyze_rolling, generate_rolling_plot, ROLLING_CHUNK_SIZE
+from dataset_store import get_dataset_store
+from rendering import render_image_path, data_digest
+from weighted_stats import valid_weighted_rows, summarize_weighted_statistics
+from hypothesis_tests import format_test_results
+from quick_look import (
+    quick_look_sample, format_quick_look, format_quick_look_correlation,
+    start_exact_analysis, get_exact_result, QUICK_LOOK_SAMPLE_SIZE
+)
+from batch_analysis import run_batch_analysis, compare_dataset_groups
 
 
 # 确保本地请求不经过代理，避免 Gradio 自检时触发 502
@@ -64,54 +77,188 @@ def create_example_data():
 example_files = create_example_data()
 
 
-def process_correlation_file(file):
-    """从上传的CSV加载相关性分析数据"""
-    if file is None:
-        return "请先上传CSV文件", gr.update(choices=[], value=None), gr.update(choices=[], value=None), None
+def _session_owner(request, scope):
+    """生成数据集持有者标识：同一会话的同一功能只持有一个数据集"""
+    if request is None or not getattr(request, 'session_hash', None):
+        return None
+    return f"{request.session_hash}:{scope}"
 
-    df = pd.read_csv(file.name)
-    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+
+def _load_correlation_dataset(path, status, request):
+    """把CSV登记到共享数据集存储，会话状态中只保存数据集句柄"""
+    handle = get_dataset_store().put_file(path, owner=_session_owner(request, 'correlation'))
+    numeric_cols = get_dataset_store().columns(handle)
     if len(numeric_cols) < 2:
         return "需要至少两列数值列用于相关性分析", gr.update(choices=[], value=None), gr.update(choices=[], value=None), None
 
     default_x = numeric_cols[0]
     default_y = numeric_cols[1] if len(numeric_cols) > 1 else numeric_cols[0]
     return (
-        f"已加载 {os.path.basename(file.name)}，请选择两列进行分析。",
+        status,
         gr.update(choices=numeric_cols, value=default_x),
         gr.update(choices=numeric_cols, value=default_y),
-        df
+        handle
+    )
+
+
+def process_correlation_file(file, request: gr.Request = None):
+    """从上传的CSV加载相关性分析数据"""
+    if file is None:
+        return "请先上传CSV文件", gr.update(choices=[], value=None), gr.update(choices=[], value=None), None
+
+    return _load_correlation_dataset(
+        file.name, f"已加载 {os.path.basename(file.name)}，请选择两列进行分析。", request
     )
 
 
-def process_correlation_example():
+def process_correlation_example(request: gr.Request = None):
     """加载预设的相关性示例数据"""
-    df = pd.read_csv(CORRELATION_EXAMPLE_FILE)
-    numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-    default_x = numeric_cols[0]
-    default_y = numeric_cols[1] if len(numeric_cols) > 1 else numeric_cols[0]
-    return (
-        "已加载示例数据（study_hours, exam_score, practice_hours）",
-        gr.update(choices=numeric_cols, value=default_x),
-        gr.update(choices=numeric_cols, value=default_y),
-        df
+    return _load_correlation_dataset(
+        CORRELATION_EXAMPLE_FILE, "已加载示例数据（study_hours, exam_score, practice_hours）", request
     )
 
 
-def run_correlation_analysis(df, col_x, col_y, method):
+def release_session_datasets(request: gr.Request):
+    """会话结束时释放其持有的数据集"""
+    get_dataset_store().release_owner(_session_owner(request, 'correlation'))
+    get_dataset_store().release_owner(_session_owner(request, 'batch'))
+    get_dataset_store().release_owner(_session_owner(request, 'hypothesis'))
+
+
+def run_correlation_analysis(handle, col_x, col_y, method, permutations=0):
     """执行相关性计算并返回结果"""
-    if df is None:
+    if handle is None:
         return "请先加载数据集", None
     if not col_x or not col_y:
         return "请选择要分析的两列", None
     if col_x == col_y:
         return "请选择不同的列进行相关性分析", None
 
-    result, fig = calculate_correlation(df, col_x, col_y, method.lower())
-    return result, fig
+    # 只按需映射两列，不复制整个数据集
+    try:
+        df = get_dataset_store().frame(handle, [col_x, col_y])
+    except KeyError:
+        return "数据集已失效，请重新加载", None
+
+    result, plot = calculate_correlation(df, col_x, col_y, method.lower(), int(permutations or 0), lazy_plot=True)
+    # 散点图只取决于数据集与两列，重复分析（如切换方法）直接复用已渲染的图片，不再绘图
+    return result, render_image_path(('scatter', handle, col_x, col_y), plot)
+
+# 批量分析的默认请求
+BATCH_EXAMPLE_SPEC = json.dumps({
+    "analyses": [
+        {"type": "statistics"},
+        {"type": "correlation", "method": "pearson"},
+        {"type": "interval", "estimate": "mean", "confidence": 0.95}
+    ]
+}, ensure_ascii=False, indent=2)
+
+
+def process_batch_request(file, handle, spec_text, include_figures=False, thumbnails_only=False,
+                          request: gr.Request = None):
+    """批量分析：一次请求对同一数据集执行多项分析，返回紧凑的JSON结果"""
+    owner = _session_owner(request, 'batch')
+    if file is not None:
+        handle = get_dataset_store().put_file(file.name, owner=owner)
+        if owner is None:
+            # 没有会话的 API 调用无法在会话结束时释放，本次请求完成后立即释放
+            try:
+                return handle, _run_batch_spec(handle, spec_text, include_figures, thumbnails_only)
+            finally:
+                get_dataset_store().release(handle)
+    if not handle:
+        return handle, {"error": "请上传CSV文件或提供数据集句柄"}
+    return handle, _run_batch_spec(handle, spec_text, include_figures, thumbnails_only)
+
+
+def _run_batch_spec(handle, spec_text, include_figures, thumbnails_only):
+    """解析批量分析请求并执行"""
+    try:
+        spec = json.loads(spec_text) if spec_text and spec_text.strip() else json.loads(BATCH_EXAMPLE_SPEC)
+    except json.JSONDecodeError:
+        return {"error": "分析请求不是有效的JSON"}
+    analyses = spec.get("analyses", []) if isinstance(spec, dict) else spec
+
+    try:
+        figures = ('thumbnail' if thumbnails_only else True) if include_figures else False
+        return run_batch_analysis(handle, analyses, figures)
+    except KeyError:
+        return {"error": "数据集不存在或已失效，请重新上传"}
+
+# 假设检验选项（界面名称 -> 检验方法 / 校正方法）
+HYPOTHESIS_TEST_CHOICES = {
+    "Welch t 检验": 'welch',
+    "Mann–Whitney U 检验": 'mann-whitney',
+    "两比例 z 检验": 'proportion',
+    "单因素方差分析": 'anova',
+}
+CORRECTION_CHOICES = {
+    "Holm": 'holm',
+    "Benjamini–Hochberg": 'bh',
+    "不校正": 'none',
+}
+
+
+def load_hypothesis_columns(file, request: gr.Request = None):
+    """把CSV登记到共享数据集存储，填充分组列与指标列的选项"""
+    if file is None:
+        return "请先上传CSV文件", gr.update(choices=[], value=None), gr.update(choices=[], value=[]), None
+
+    # 分组标签（包括文本标签）与数值列只解析一次，之后的检验都基于同一个数据集句柄
+    handle = get_dataset_store().put_file(file.name, owner=_session_owner(request, 'hypothesis'))
+    numeric_cols = get_dataset_store().columns(handle)
+    if not numeric_cols:
+        return "没有找到数值列", gr.update(choices=[], value=None), gr.update(choices=[], value=[]), handle
+
+    group_cols = get_dataset_store().category_columns(handle) + numeric_cols
+    return (
+        f"已加载 {os.path.basename(file.name)}，请选择分组列和要比较的指标列。",
+        gr.update(choices=group_cols, value=group_cols[0]),
+        gr.update(choices=numeric_cols, value=[col for col in numeric_cols if col != group_cols[0]]),
+        handle
+    )
+
+
+def process_hypothesis_test(handle, group_col, metric_cols, test_choice, correction_choice, threshold=None):
+    """对多个指标同时进行分组比较，并做多重比较校正"""
+    if handle is None:
+        return "请先上传CSV文件并加载列"
+    if not group_col:
+        return "请选择分组列"
+    metric_cols = [col for col in (metric_cols or []) if col != group_col]
+    if not metric_cols:
+        return "请至少选择一个指标列"
+
+    threshold_value = None
+    if threshold is not None and str(threshold).strip():
+        try:
+            threshold_value = float(threshold)
+        except ValueError:
+            return "阈值格式错误，请输入有效的数字"
+
+    test = HYPOTHESIS_TEST_CHOICES.get(test_choice, 'welch')
+    correction = CORRECTION_CHOICES.get(correction_choice, 'holm')
+    try:
+        # 分组充分统计量按数据集缓存，重复检验或切换校正方法时不再重新读取数据
+        frame = compare_dataset_groups(handle, group_col, metric_cols, test, correction,
+                                       threshold=threshold_value)
+    except KeyError:
+        return "数据集已失效，请重新加载"
+    except ValueError as e:
+        return str(e)
+    return format_test_results(frame, test, correction)
+
+# 直方图分箱规则选项（界面名称 -> 规则名）
+HISTOGRAM_RULE_CHOICES = {
+    "自动": 'auto',
+    "Sturges": 'sturges',
+    "Freedman–Diaconis": 'freedman-diaconis',
+    "Scott": 'scott',
+    "Doane": 'doane',
+}
 
 # 处理上传的CSV文件
-def process_file(file):
+def process_file(file, rule_choice="自动", frequency_table=False):
     if file is None:
         return None, None, None
 
@@ -121,15 +268,135 @@ def process_file(file):
     if not numeric_cols:
         return "没有找到数值列", None, None
 
+    rule = HISTOGRAM_RULE_CHOICES.get(rule_choice, 'auto')
+    if frequency_table:
+        # 频数表：第一列为取值，第二列为该取值出现的次数，直接在压缩表示上计算
+        if len(numeric_cols) < 2:
+            return "频数表需要两列数值列（取值, 频数）", None, None
+        values_col, count_col = numeric_cols[0], numeric_cols[1]
+        # 只丢弃无效行、不合并相同取值
+        values, counts = valid_weighted_rows(df[values_col].values, df[count_col].values)
+        if len(values) == 0:
+            return "数据为空", None, None
+
+        # 第二列是频数（可以不是整数），样本量为总频数
+        summary = summarize_weighted_statistics(values, counts, weight_type='frequency')
+        stats = calculate_statistics(values, summary, counts, weight_type='frequency')
+        key = data_digest(values, counts)
+        hist_image = render_image_path(('histogram', key, values_col, rule),
+                                       lambda: generate_histogram(values, values_col, rule, summary, counts))
+        box_image = render_image_path(('boxplot', key, values_col),
+                                      lambda: generate_boxplot(values, values_col, counts))
+        return stats, hist_image, box_image
+
     # 默认选择第一个数值列
     selected_col = numeric_cols[0]
     data = df[selected_col].dropna().values
 
-    stats = calculate_statistics(data)
-    hist_fig = generate_histogram(data, selected_col)
-    box_fig = generate_boxplot(data, selected_col)
+    # 统计量只计算一次，供结果表格与直方图分箱共同使用
+    summary = summarize_statistics(data)
+    stats = calculate_statistics(data, summary)
+    # 图表按数据内容与绘图参数缓存，同一文件重复分析时不再重新绘制
+    key = data_digest(data)
+    hist_image = render_image_path(('histogram', key, selected_col, rule),
+                                   lambda: generate_histogram(data, selected_col, rule, summary))
+    box_image = render_image_path(('boxplot', key, selected_col), lambda: generate_boxplot(data, selected_col))
+
+    return stats, hist_image, box_image
+
+# 处理滚动分析的CSV文件（按块流式读取，只扫描一遍）
+def process_rolling_file(file, window):
+    if file is None:
+        return "请先上传CSV文件", None, None
+
+    window = int(window)
+    if window < 2:
+        return "窗口大小至少为2", None, None
+
+    reader = pd.read_csv(file.name, chunksize=ROLLING_CHUNK_SIZE)
+    first_chunk = next(reader, None)
+    if first_chunk is None:
+        return "数据为空", None, None
+
+    numeric_cols = first_chunk.select_dtypes(include=[np.number]).columns.tolist()
+    if not numeric_cols:
+        return "没有找到数值列", None, None
+
+    # 默认选择第一个数值列，按文件中的行顺序视为时间顺序
+    selected_col = numeric_cols[0]
+    chunks = (
+        pd.to_numeric(chunk[selected_col], errors='coerce').values
+        for chunk in itertools.chain([first_chunk], reader)
+    )
+    try:
+        result, buckets, histogram = analyze_rolling(chunks, window, selected_col)
+    except ValueError as e:
+        return str(e), None, None
+    if buckets is None:
+        return result, None, None
+
+    # 缓存键取自同一遍扫描得到的抽稀结果与直方图计数，不再为计算哈希重新读取文件；
+    # 命中缓存时不绘图
+    key = data_digest(buckets.to_numpy(dtype=float), histogram.counts, histogram.edges)
+    return (result,
+            render_image_path(('rolling', key, selected_col, window),
+                              lambda: generate_rolling_plot(buckets, window, selected_col)),
+            render_image_path(('rolling-histogram', key, selected_col),
+                              lambda: generate_histogram_from_counts(histogram.counts, histogram.edges, selected_col)))
+
+# 快速预览：抽样计算并给出误差界
+def process_quick_look(file, sample_size):
+    if file is None:
+        return "请先上传CSV文件", None, None
+
+    sample_size = int(sample_size or QUICK_LOOK_SAMPLE_SIZE)
+    if sample_size < 100:
+        return "样本量至少为100", None, None
+
+    sample, total_rows, exact_rows = quick_look_sample(file.name, sample_size)
+    numeric_cols = sample.select_dtypes(include=[np.number]).columns.tolist()
+    if not numeric_cols:
+        return "没有找到数值列", None, None
+
+    # 与上传分析一致，默认选择第一个数值列；有第二个数值列时附带相关性估计
+    selected_col = numeric_cols[0]
+    data = sample[selected_col].dropna().values
+    if len(data) < 2:
+        return "样本中的有效数据不足", None, None
+    # 大文件按字节偏移有放回抽样，误差界不做有限总体校正
+    # 抽样比例按抽到的行数（含缺失行）计算，与包含缺失行的总行数一致
+    result = format_quick_look(data, total_rows, exact_rows, selected_col,
+                               with_replacement=not exact_rows, sample_rows=len(sample))
+    if len(numeric_cols) > 1:
+        result += format_quick_look_correlation(
+            sample[numeric_cols[0]].values.astype(float), sample[numeric_cols[1]].values.astype(float),
+            numeric_cols[0], numeric_cols[1]
+        )
 
-    return stats, hist_fig, box_fig
+    title = f"{selected_col}（样本）"
+    hist_image = render_image_path(('histogram', data_digest(data), title, 'auto'),
+                                   lambda: generate_histogram(data, title))
+    return result, hist_image, numeric_cols[:2]
+
+# 提交后台精确计算
+def process_exact_request(file, columns):
+    if file is None or not columns:
+        return None, "请先进行快速预览"
+    job_id = start_exact_analysis(file.name, columns)
+    return job_id, "精确计算已在后台开始，完成后点击\"查看精确结果\""
+
+# 查询后台精确计算结果
+def process_exact_result(job_id):
+    if not job_id:
+        return "尚未提交精确计算"
+    status, result = get_exact_result(job_id)
+    if status == 'running':
+        return "精确计算仍在进行中，请稍后再查看"
+    if status == 'failed':
+        return f"精确计算失败: {result}"
+    if status == 'missing':
+        return "未找到该计算任务（可能已过期），请重新提交"
+    return result
 
 # 处理手动输入的数据
 def process_manual_input(text_input):
@@ -142,11 +409,15 @@ def process_manual_input(text_input):
         if not data:
             return "无法解析数据", None, None
 
-        stats = calculate_statistics(np.array(data))
-        hist_fig = generate_histogram(np.array(data), "输入数据")
-        box_fig = generate_boxplot(np.array(data), "输入数据")
+        data = np.array(data)
+        summary = summarize_statistics(data)
+        stats = calculate_statistics(data, summary)
+        key = data_digest(data)
+        hist_image = render_image_path(('histogram', key, "输入数据", 'auto'),
+                                       lambda: generate_histogram(data, "输入数据", summary=summary))
+        box_image = render_image_path(('boxplot', key, "输入数据"), lambda: generate_boxplot(data, "输入数据"))
 
-        return stats, hist_fig, box_fig
+        return stats, hist_image, box_image
     except ValueError:
         return "数据格式错误，请确保输入的是数字，并用逗号、空格或换行符分隔", None, None
 
@@ -159,11 +430,16 @@ def process_example(example_choice):
     df = pd.read_csv(file_path)
     data = df['value'].values
 
-    stats = calculate_statistics(data)
-    hist_fig = generate_histogram(data, os.path.basename(file_path).replace('.csv', ''))
-    box_fig = generate_boxplot(data, os.path.basename(file_path).replace('.csv', ''))
+    summary = summarize_statistics(data)
+    stats = calculate_statistics(data, summary)
+    # 示例数据固定不变，首次渲染后每次查看都直接命中缓存
+    title = os.path.basename(file_path).replace('.csv', '')
+    key = data_digest(data)
+    hist_image = render_image_path(('histogram', key, title, 'auto'),
+                                   lambda: generate_histogram(data, title, summary=summary))
+    box_image = render_image_path(('boxplot', key, title), lambda: generate_boxplot(data, title))
 
-    return stats, hist_fig, box_fig
+    return stats, hist_image, box_image
 
 # 处理参数估计
 def process_parameter_estimation(text_input, estimate_type, confidence_level, threshold=None):
@@ -221,15 +497,24 @@ with gr.Blocks(title="StatEase - 简易统计分析工具") as app:
     with gr.Tabs():
         with gr.TabItem("上传数据"):
             file_input = gr.File(label="上传CSV文件")
+            hist_rule = gr.Dropdown(
+                list(HISTOGRAM_RULE_CHOICES.keys()),
+                label="直方图分箱规则",
+                value="自动"
+            )
+            frequency_table = gr.Checkbox(
+                label="频数表格式（第一列为取值，第二列为频数）",
+                value=False
+            )
             upload_button = gr.Button("分析")
             upload_output = gr.Markdown(label="统计结果")
             with gr.Row():
-                hist_output1 = gr.Plot(label="直方图")
-                box_output1 = gr.Plot(label="箱线图")
+                hist_output1 = gr.Image(label="直方图", type="filepath")
+                box_output1 = gr.Image(label="箱线图", type="filepath")
 
             upload_button.click(
                 fn=process_file,
-                inputs=[file_input],
+                inputs=[file_input, hist_rule, frequency_table],
                 outputs=[upload_output, hist_output1, box_output1]
             )
 
@@ -242,8 +527,8 @@ with gr.Blocks(title="StatEase - 简易统计分析工具") as app:
             manual_button = gr.Button("分析")
             manual_output = gr.Markdown(label="统计结果")
             with gr.Row():
-                hist_output2 = gr.Plot(label="直方图")
-                box_output2 = gr.Plot(label="箱线图")
+                hist_output2 = gr.Image(label="直方图", type="filepath")
+                box_output2 = gr.Image(label="箱线图", type="filepath")
 
             manual_button.click(
                 fn=process_manual_input,
@@ -260,8 +545,8 @@ with gr.Blocks(title="StatEase - 简易统计分析工具") as app:
             example_button = gr.Button("分析")
             example_output = gr.Markdown(label="统计结果")
             with gr.Row():
-                hist_output3 = gr.Plot(label="直方图")
-                box_output3 = gr.Plot(label="箱线图")
+                hist_output3 = gr.Image(label="直方图", type="filepath")
+                box_output3 = gr.Image(label="箱线图", type="filepath")
 
             # 映射下拉菜单选项到文件路径
             def map_example_choice(choice):
@@ -278,6 +563,55 @@ with gr.Blocks(title="StatEase - 简易统计分析工具") as app:
                 outputs=[example_output, hist_output3, box_output3]
             )
 
+        with gr.TabItem("快速预览"):
+            gr.Markdown("对超大文件先抽样快速估计统计量（附误差界），需要时再在后台计算精确结果。")
+            quick_columns_state = gr.State()
+            quick_job_state = gr.State()
+            with gr.Row():
+                quick_file = gr.File(label="上传CSV文件")
+                quick_sample_size = gr.Number(label="样本量", value=QUICK_LOOK_SAMPLE_SIZE, precision=0)
+            quick_button = gr.Button("快速预览")
+            quick_output = gr.Markdown(label="快速预览结果")
+            quick_hist = gr.Image(label="样本直方图", type="filepath")
+            with gr.Row():
+                exact_button = gr.Button("后台计算精确结果")
+                exact_check_button = gr.Button("查看精确结果")
+            exact_output = gr.Markdown(label="精确结果")
+
+            quick_button.click(
+                fn=process_quick_look,
+                inputs=[quick_file, quick_sample_size],
+                outputs=[quick_output, quick_hist, quick_columns_state]
+            )
+
+            exact_button.click(
+                fn=process_exact_request,
+                inputs=[quick_file, quick_columns_state],
+                outputs=[quick_job_state, exact_output]
+            )
+
+            exact_check_button.click(
+                fn=process_exact_result,
+                inputs=[quick_job_state],
+                outputs=[exact_output]
+            )
+
+        with gr.TabItem("滚动分析"):
+            gr.Markdown("按行顺序对第一个数值列做滑动窗口分析：滚动均值、标准差、偏度、四分位数及异常值标记。")
+            rolling_file = gr.File(label="上传CSV文件（行顺序即时间顺序）")
+            rolling_window = gr.Number(label="窗口大小（数据点个数）", value=50, precision=0)
+            rolling_button = gr.Button("分析")
+            rolling_output = gr.Markdown(label="滚动统计结果")
+            with gr.Row():
+                rolling_plot = gr.Image(label="滚动统计时序图", type="filepath")
+                rolling_hist = gr.Image(label="值分布直方图", type="filepath")
+
+            rolling_button.click(
+                fn=process_rolling_file,
+                inputs=[rolling_file, rolling_window],
+                outputs=[rolling_output, rolling_plot, rolling_hist]
+            )
+
         with gr.TabItem("相关性分析"):
             corr_state = gr.State()
             gr.Markdown("选择两列数值数据，计算 Pearson 或 Spearman 相关系数，并查看散点图与拟合线。")
@@ -298,10 +632,15 @@ with gr.Blocks(title="StatEase - 简易统计分析工具") as app:
                 label="相关性方法",
                 value="Pearson"
             )
+            corr_permutations = gr.Number(
+                label="置换检验次数（0 表示不进行置换检验）",
+                value=0,
+                precision=0
+            )
 
             calc_corr_btn = gr.Button("计算相关性")
             corr_output = gr.Markdown(label="相关性结果")
-            corr_plot = gr.Plot(label="散点图与回归线")
+            corr_plot = gr.Image(label="散点图与回归线", type="filepath")
 
             load_corr_btn.click(
                 fn=process_correlation_file,
@@ -317,10 +656,69 @@ with gr.Blocks(title="StatEase - 简易统计分析工具") as app:
 
             calc_corr_btn.click(
                 fn=run_correlation_analysis,
-                inputs=[corr_state, corr_col_x, corr_col_y, corr_method],
+                inputs=[corr_state, corr_col_x, corr_col_y, corr_method, corr_permutations],
                 outputs=[corr_output, corr_plot]
             )
 
+        with gr.TabItem("批量分析"):
+            gr.Markdown("对同一数据集一次执行多项分析（描述统计、相关性、置信区间），结果以JSON返回，也可通过 API 端点 `/batch_analysis` 调用。")
+            with gr.Row():
+                batch_file = gr.File(label="上传CSV文件（已有数据集句柄时可不上传）")
+                batch_handle = gr.Textbox(label="数据集句柄", placeholder="上传文件后自动填写")
+            batch_spec = gr.Code(label="分析请求 (JSON)", language="json", value=BATCH_EXAMPLE_SPEC)
+            with gr.Row():
+                batch_figures = gr.Checkbox(label="附带图表（base64 编码图片）", value=False)
+                batch_thumbnails = gr.Checkbox(label="仅返回缩略图", value=False)
+            batch_button = gr.Button("批量分析")
+            batch_output = gr.JSON(label="分析结果")
+
+            batch_button.click(
+                fn=process_batch_request,
+                inputs=[batch_file, batch_handle, batch_spec, batch_figures, batch_thumbnails],
+                outputs=[batch_handle, batch_output],
+                api_name="batch_analysis"
+            )
+
+        with gr.TabItem("假设检验"):
+            gr.Markdown("按分组列把每个分组与对照组（排序后的第一个分组）比较，可同时检验多个指标并进行多重比较校正。")
+            with gr.Row():
+                test_file = gr.File(label="上传CSV文件（包含分组列与指标列）")
+                load_test_btn = gr.Button("加载列")
+            test_status = gr.Markdown("等待加载数据…")
+            with gr.Row():
+                test_group_col = gr.Dropdown(label="分组列", choices=[], interactive=True)
+                test_metric_cols = gr.Dropdown(label="指标列", choices=[], multiselect=True, interactive=True)
+            with gr.Row():
+                test_method = gr.Radio(
+                    list(HYPOTHESIS_TEST_CHOICES.keys()),
+                    label="检验方法",
+                    value="Welch t 检验"
+                )
+                test_correction = gr.Radio(
+                    list(CORRECTION_CHOICES.keys()),
+                    label="多重比较校正",
+                    value="Holm"
+                )
+            test_threshold = gr.Textbox(
+                label="阈值（仅用于两比例检验，大于等于此值视为'成功'；留空时指标应为0/1变量）",
+                placeholder="例如: 50"
+            )
+            run_test_btn = gr.Button("进行检验")
+            test_output = gr.Markdown(label="检验结果")
+            test_handle = gr.State(None)
+
+            load_test_btn.click(
+                fn=load_hypothesis_columns,
+                inputs=[test_file],
+                outputs=[test_status, test_group_col, test_metric_cols, test_handle]
+            )
+
+            run_test_btn.click(
+                fn=process_hypothesis_test,
+                inputs=[test_handle, test_group_col, test_metric_cols, test_method, test_correction, test_threshold],
+                outputs=[test_output]
+            )
+
         with gr.TabItem("参数估计"):
             param_text_input = gr.Textbox(
                 label="输入数据（用逗号、空格或换行符分隔）",
@@ -366,15 +764,23 @@ with gr.Blocks(title="StatEase - 简易统计分析工具") as app:
                 outputs=[param_output]
             )
 
+    # 会话断开时释放共享数据集的引用（旧版 Gradio 无此事件时依赖重新加载时释放）
+    if hasattr(app, 'unload'):
+        app.unload(release_session_datasets)
+
     gr.Markdown("""
     ## 使用说明
     1. **上传数据**: 上传CSV格式的数据文件进行分析
     2. **手动输入**: 直接输入数据值，用逗号、空格或换行符分隔
     3. **示例数据**: 选择预设的示例数据集进行分析
-    4. **参数估计**: 计算样本均值和比例的点估计与区间估计
+    4. **快速预览**: 对超大文件抽样估计统计量并给出误差界，可在后台计算精确结果
+    5. **滚动分析**: 对按时间排序的数据计算滑动窗口统计量并标记局部异常值
+    6. **参数估计**: 计算样本均值和比例的点估计与区间估计
        - 均值估计: 计算样本均值及其置信区间
        - 比例估计: 计算样本比例及其置信区间（需设置阈值）
        - 可选择不同的置信水平（90%、95%、99%）
+    7. **假设检验**: 多指标、多分组的 Welch t、Mann–Whitney、两比例 z 检验与方差分析，支持 Holm / BH 校正
+    8. **批量分析**: 以JSON描述多项分析，一次请求返回全部结果，适合通过 API 调用
 
     分析结果包括基本统计量（均值、中位数、标准差等）、数据可视化和参数估计。
     """)
@@ -0,0 +1,508 @@
+import base64
+import numpy as np
+import pandas as pd
+from scipy import stats
+# 导入中文字体配置
+import font_config
+from dataset_store import get_dataset_store
+from rendering import render_cache
+from data_processor import generate_histogram, generate_boxplot, generate_scatter_plot
+from permutation_test import permutation_test_correlation
+from hypothesis_tests import compare_groups, group_sufficient_statistics
+
+
+ANALYSIS_TYPES = ('statistics', 'correlation', 'interval', 'test')
+
+
+def _to_json_value(value):
+    """把 numpy 标量转换为可序列化的 Python 数值，NaN/inf 记为 None"""
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def _figure_to_base64(key, figure, include_figures):
+    """
+    从渲染缓存取得图表（未命中时才绘制），编码为 base64 字符串
+
+    include_figures 为 'thumbnail' 时只返回缩略图，其余真值返回完整图片。
+    """
+    entry = render_cache.render(key, figure)
+    image = entry['thumbnail'] if include_figures == 'thumbnail' else entry['image']
+    return base64.b64encode(image).decode('ascii')
+
+
+def summarize_columns(matrix):
+    """
+    对矩阵的每一列同时计算描述性统计量（忽略NaN）
+
+    与 summarize_statistics 返回相同的字段，但所有列在一次向量化运算中完成。
+
+    参数:
+    - matrix: 形状为 (行数, 列数) 的二维数组
+
+    返回:
+    - 字段名到长度为列数的数组的字典
+    """
+    has_nan = np.isnan(matrix).any()
+    count = np.count_nonzero(~np.isnan(matrix), axis=0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if has_nan:
+            mean = np.nanmean(matrix, axis=0)
+            q1, median, q3 = np.nanpercentile(matrix, [25, 50, 75], axis=0)
+            min_val, max_val = np.nanmin(matrix, axis=0), np.nanmax(matrix, axis=0)
+        else:
+            mean = matrix.mean(axis=0)
+            q1, median, q3 = np.percentile(matrix, [25, 50, 75], axis=0)
+            min_val, max_val = matrix.min(axis=0), matrix.max(axis=0)
+
+        # 中心矩（有偏估计，与 np.std、stats.skew、stats.kurtosis 的默认设置一致）
+        deviation = matrix - mean
+        m2 = np.nansum(deviation ** 2, axis=0) / count
+        m3 = np.nansum(deviation ** 3, axis=0) / count
+        m4 = np.nansum(deviation ** 4, axis=0) / count
+        skewness = m3 / m2 ** 1.5
+        kurtosis = m4 / m2 ** 2 - 3
+
+    iqr = q3 - q1
+    lower_bound = q1 - 1.5 * iqr
+    upper_bound = q3 + 1.5 * iqr
+    outlier_count = np.count_nonzero((matrix < lower_bound) | (matrix > upper_bound), axis=0)
+
+    return {
+        'count': count,
+        'mean': mean,
+        'median': median,
+        'std': np.sqrt(m2),
+        'min': min_val,
+        'max': max_val,
+        'q1': q1,
+        'q3': q3,
+        'iqr': iqr,
+        'skewness': skewness,
+        'kurtosis': kurtosis,
+        'outlier_count': outlier_count,
+    }
+
+
+def _standardize(values):
+    """把列标准化为均值0、方差1（常数列返回 None）"""
+    centered = values - values.mean()
+    scale = np.sqrt(np.dot(centered, centered) / len(values))
+    if scale == 0:
+        return None
+    return centered / scale
+
+
+def correlation_p_values(r, n):
+    """由相关系数与样本量计算双侧 p 值（t 分布，适用于 Pearson 与 Spearman）"""
+    r = np.asarray(r, dtype=float)
+    n = np.asarray(n, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = r * np.sqrt((n - 2) / (1 - r ** 2))
+    p = 2 * stats.t.sf(np.abs(t), n - 2)
+    return np.where(np.abs(r) >= 1, 0.0, p)
+
+
+class _ParsedDataset:
+    """一次批处理中共享的已解析数据：各列只读取、排秩和标准化一次，且只在需要时读取"""
+
+    def __init__(self, handle, columns, store):
+        self.handle = handle
+        self.store = store
+        self.columns = list(columns)
+        self.numeric_columns = store.columns(handle)
+        self.position = {name: i for i, name in enumerate(self.columns)}
+        self._matrix = None
+        self._summary = None
+        self._standardized = {}
+
+    @property
+    def matrix(self):
+        if self._matrix is None:
+            self._matrix = np.column_stack([np.asarray(self.store.column(self.handle, name), dtype=float)
+                                            for name in self.columns]) if self.columns else np.empty((0, 0))
+        return self._matrix
+
+    @property
+    def missing(self):
+        return np.isnan(self.matrix).any(axis=0) if self.columns else np.array([], dtype=bool)
+
+    def column(self, name):
+        return self.matrix[:, self.position[name]]
+
+    def summary(self):
+        if self._summary is None:
+            self._summary = summarize_columns(self.matrix)
+        return self._summary
+
+    def column_summary(self, name):
+        i = self.position[name]
+        return {key: values[i] for key, values in self.summary().items()}
+
+    def frame(self, columns):
+        """数值列取自已读取的矩阵，分类列（如分组标签）还原为标签"""
+        return pd.DataFrame({name: self.column(name) if name in self.position
+                             else self.store.decoded_column(self.handle, name) for name in columns}, copy=False)
+
+    def group_summary(self, group_col, metric_cols, threshold=None):
+        """
+        按分组的充分统计量（n、均值、方差）
+
+        缓存在数据集存储中：同一数据集上的后续检验（包括之后的请求）直接复用，不再扫描数据。
+        """
+        key = ('group_summary', group_col, tuple(metric_cols), threshold)
+        return self.store.cached(self.handle, key, lambda: group_sufficient_statistics(
+            self.frame([group_col] + list(metric_cols)), group_col, list(metric_cols), threshold))
+
+    def standardized(self, name, method):
+        """无缺失值列的标准化值（Spearman 先转换为秩），结果在批处理内复用"""
+        key = (name, method)
+        if key not in self._standardized:
+            values = self.column(name)
+            if method == 'spearman':
+                values = stats.rankdata(values)
+            self._standardized[key] = _standardize(values)
+        return self._standardized[key]
+
+
+def _run_statistics(dataset, spec, include_figures):
+    columns = spec.get('columns') or dataset.numeric_columns
+    summary = dataset.summary()
+    results = []
+    for name in columns:
+        i = dataset.position[name]
+        item = {'column': name}
+        if summary['count'][i] == 0:
+            item['error'] = "数据为空"
+        else:
+            item.update({key: (int(values[i]) if key in ('count', 'outlier_count') else _to_json_value(values[i]))
+                         for key, values in summary.items()})
+            if include_figures:
+                data = dataset.column(name)
+                data = data[~np.isnan(data)]
+                item['histogram'] = _figure_to_base64(
+                    ('histogram', dataset.handle, name, 'auto'),
+                    lambda: generate_histogram(data, name, summary=dataset.column_summary(name)),
+                    include_figures)
+                item['boxplot'] = _figure_to_base64(
+                    ('boxplot', dataset.handle, name), lambda: generate_boxplot(data, name), include_figures)
+        results.append(item)
+    return results
+
+
+def _scatter_plot(dataset, col_x, col_y):
+    x, y = dataset.column(col_x), dataset.column(col_y)
+    complete = ~(np.isnan(x) | np.isnan(y))
+    return generate_scatter_plot(x[complete], y[complete], col_x, col_y)
+
+
+def _run_correlation(dataset, spec, include_figures):
+    method = spec.get('method', 'pearson').lower()
+    if method not in ('pearson', 'spearman'):
+        raise ValueError(f"不支持的相关性方法: {method}。请选择 'pearson' 或 'spearman'")
+
+    permutations = int(spec.get('permutations', 0))
+    alpha = float(spec.get('alpha', 0.05))
+
+    pairs = spec.get('pairs')
+    if pairs is None:
+        columns = spec.get('columns') or dataset.numeric_columns
+        pairs = [(a, b) for i, a in enumerate(columns) for b in columns[i + 1:]]
+
+    coefficients = np.full(len(pairs), np.nan)
+    sizes = np.zeros(len(pairs))
+    complete_pairs = [k for k, (col_x, col_y) in enumerate(pairs)
+                      if not (dataset.missing[dataset.position[col_x]] or dataset.missing[dataset.position[col_y]])]
+    if complete_pairs:
+        # 没有缺失值的列复用共享的标准化结果，一次矩阵乘法 Z^T Z / n 得到全部相关系数；
+        # 常数列以 NaN 占位，对应的系数为 NaN
+        n = len(dataset.matrix)
+        names = list(dict.fromkeys(name for k in complete_pairs for name in pairs[k]))
+        index = {name: i for i, name in enumerate(names)}
+        z = np.empty((n, len(names)))
+        for name, i in index.items():
+            standardized = dataset.standardized(name, method)
+            z[:, i] = standardized if standardized is not None else np.nan
+        matrix = z.T @ z / n
+        for k in complete_pairs:
+            col_x, col_y = pairs[k]
+            coefficients[k] = matrix[index[col_x], index[col_y]]
+            sizes[k] = n
+
+    for k, (col_x, col_y) in enumerate(pairs):
+        if dataset.missing[dataset.position[col_x]] or dataset.missing[dataset.position[col_y]]:
+            # 存在缺失值：按配对完整的观测值单独计算
+            x, y = dataset.column(col_x), dataset.column(col_y)
+            complete = ~(np.isnan(x) | np.isnan(y))
+            x, y = x[complete], y[complete]
+            if method == 'spearman':
+                x, y = stats.rankdata(x), stats.rankdata(y)
+            sizes[k] = len(x)
+            zx, zy = (_standardize(x), _standardize(y)) if len(x) else (None, None)
+            if zx is not None and zy is not None:
+                coefficients[k] = np.dot(zx, zy) / sizes[k]
+
+    coefficients = np.clip(coefficients, -1.0, 1.0)
+    p_values = correlation_p_values(coefficients, sizes)
+
+    results = []
+    for k, (col_x, col_y) in enumerate(pairs):
+        item = {'x': col_x, 'y': col_y, 'method': method, 'n': int(sizes[k])}
+        if sizes[k] < 3:
+            item['error'] = "有效样本量不足，至少需要3个配对观测值"
+        else:
+            item['coefficient'] = _to_json_value(coefficients[k])
+            item['p_value'] = _to_json_value(p_values[k])
+            if permutations > 0 and np.isfinite(coefficients[k]):
+                x, y = dataset.column(col_x), dataset.column(col_y)
+                complete = ~(np.isnan(x) | np.isnan(y))
+                permutation = permutation_test_correlation(x[complete], y[complete], method, permutations, alpha)
+                item['permutation_p_value'] = _to_json_value(permutation['p_value'])
+                item['permutations'] = permutation['permutations']
+                item['exact'] = permutation['exact']
+            if include_figures:
+                item['scatter'] = _figure_to_base64(
+                    ('scatter', dataset.handle, col_x, col_y),
+                    lambda: _scatter_plot(dataset, col_x, col_y), include_figures)
+        results.append(item)
+    return results
+
+
+def _run_interval(dataset, spec):
+    estimate = spec.get('estimate', 'mean')
+    if estimate not in ('mean', 'proportion'):
+        raise ValueError(f"不支持的估计类型: {estimate}。请选择 'mean' 或 'proportion'")
+    confidence_level = float(spec.get('confidence', 0.95))
+    alpha = 1 - confidence_level
+
+    columns = spec.get('columns') or dataset.columns
+    indices = [dataset.position[name] for name in columns]
+    summary = dataset.summary()
+    n = summary['count'][indices].astype(float)
+    mean = summary['mean'][indices]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if estimate == 'mean':
+            # 无偏标准差由有偏标准差换算，不再重新扫描数据
+            std_error = summary['std'][indices] * np.sqrt(n / (n - 1)) / np.sqrt(n)
+            critical = stats.t.ppf(1 - alpha / 2, df=n - 1)
+            point = mean
+            minimum_n, error = 2, "样本量不足，无法计算置信区间（至少需要2个观测值）"
+        else:
+            threshold = spec.get('threshold')
+            thresholds = summary['median'][indices] if threshold is None else np.full(len(indices), float(threshold))
+            successes = np.count_nonzero(dataset.matrix[:, indices] >= thresholds, axis=0)
+            point = successes / n
+            std_error = np.sqrt(point * (1 - point) / n)
+            critical = np.full(len(indices), stats.norm.ppf(1 - alpha / 2))
+            minimum_n, error = 30, "样本量不足，建议使用至少30个观测值来估计比例的置信区间"
+
+    margin = critical * std_error
+    lower, upper = point - margin, point + margin
+    if estimate == 'proportion':
+        lower, upper = np.maximum(lower, 0), np.minimum(upper, 1)
+
+    results = []
+    for k, name in enumerate(columns):
+        item = {'column': name, 'estimate': estimate, 'confidence': confidence_level, 'n': int(n[k])}
+        if n[k] < minimum_n:
+            item['error'] = error
+        else:
+            item.update({
+                'point': _to_json_value(point[k]),
+                'std_error': _to_json_value(std_error[k]),
+                'lower': _to_json_value(lower[k]),
+                'upper': _to_json_value(upper[k]),
+                'margin_of_error': _to_json_value(margin[k]),
+            })
+            if estimate == 'proportion':
+                item['threshold'] = _to_json_value(thresholds[k])
+                item['successes'] = int(successes[k])
+        results.append(item)
+    return results
+
+
+def _compare(dataset, group_col, metrics, test, correction, control=None, threshold=None):
+    """在共享数据集上做分组比较，充分统计量按数据集缓存"""
+    if control is not None and group_col not in dataset.position:
+        # 分类列的标签保存为字符串，数值形式的对照组标签（如 JSON 中的 5）按字符串匹配
+        control = str(control)
+    summary = dataset.group_summary(group_col, metrics, threshold if test == 'proportion' else None)
+    raw = dataset.frame([group_col] + list(metrics)) if test == 'mann-whitney' else None
+    return compare_groups(raw, group_col, metrics, test, correction,
+                          control=control, threshold=threshold, summary=summary)
+
+
+def _run_test(dataset, spec):
+    group_col = spec.get('group')
+    if not group_col:
+        raise ValueError("假设检验需要指定分组列 group")
+    metrics = spec.get('metrics') or [name for name in dataset.numeric_columns if name != group_col]
+    test = spec.get('test', 'welch')
+    correction = spec.get('correction', 'holm')
+    threshold = spec.get('threshold')
+    threshold = float(threshold) if threshold is not None else None
+
+    frame = _compare(dataset, group_col, metrics, test, correction,
+                     control=spec.get('control'), threshold=threshold)
+
+    results = []
+    for record in frame.to_dict(orient='records'):
+        results.append({key: (_to_json_value(value) if isinstance(value, (float, np.floating)) else
+                              value.item() if isinstance(value, np.generic) else value)
+                        for key, value in record.items()})
+    return results
+
+
+def compare_dataset_groups(handle, group_col, metric_cols, test='welch', correction='holm',
+                           control=None, threshold=None, store=None):
+    """
+    在共享数据集存储中的数据集上做多组比较（供假设检验界面使用）
+
+    分组充分统计量缓存在存储中，同一数据集上重复检验或切换校正方法时不再扫描数据。
+
+    参数:
+    - handle: 数据集句柄
+    - group_col: 分组列（数值列或分类列）
+    - metric_cols: 指标列名列表
+    - test / correction / control / threshold: 同 compare_groups
+    - store: 数据集存储，默认使用进程内共享的存储
+
+    返回:
+    - 检验结果 (DataFrame)
+    """
+    if store is None:
+        store = get_dataset_store()
+    store.acquire(handle)
+    try:
+        names = store.columns(handle)
+        unknown = [name for name in metric_cols if name not in names]
+        if unknown:
+            raise ValueError(f"数据集中不存在以下数值列: {', '.join(unknown)}")
+        if group_col not in names and group_col not in store.category_columns(handle):
+            raise ValueError(f"数据集中不存在分组列: {group_col}")
+        required = list(dict.fromkeys([name for name in [group_col] + list(metric_cols) if name in names]))
+        dataset = _ParsedDataset(handle, required, store)
+        return _compare(dataset, group_col, list(metric_cols), test, correction, control, threshold)
+    finally:
+        store.release(handle)
+
+
+def validate_analyses(analyses):
+    """
+    在读取数据前检查批量分析请求的结构
+
+    返回:
+    - 错误信息；结构正确时返回 None
+    """
+    if not isinstance(analyses, list):
+        return "analyses 必须是分析请求组成的列表"
+
+    def is_name_list(value):
+        return isinstance(value, list) and all(isinstance(name, str) for name in value)
+
+    for position, spec in enumerate(analyses, start=1):
+        if not isinstance(spec, dict):
+            return f"第{position}项分析请求必须是JSON对象"
+        for key in ('columns', 'metrics'):
+            if spec.get(key) is not None and not is_name_list(spec[key]):
+                return f"第{position}项分析请求的 {key} 必须是列名组成的列表"
+        pairs = spec.get('pairs')
+        if pairs is not None and not (isinstance(pairs, list) and
+                                      all(is_name_list(pair) and len(pair) == 2 for pair in pairs)):
+            return f"第{position}项分析请求的 pairs 必须是由两个列名组成的列表的列表"
+        for key in ('type', 'method', 'estimate', 'test', 'correction', 'group'):
+            if spec.get(key) is not None and not isinstance(spec[key], str):
+                return f"第{position}项分析请求的 {key} 必须是字符串"
+    return None
+
+
+def _required_columns(analyses, available):
+    """
+    收集批处理涉及的全部列，保证每列只读取一次
+
+    返回:
+    - (数值列名列表, 分组列名列表)；分组列可以是数值列，也可以是分类列
+    """
+    required = []
+    groups = []
+    for spec in analyses:
+        names = list(spec.get('columns') or [])
+        for pair in spec.get('pairs') or []:
+            names.extend(pair)
+        if spec.get('group'):
+            groups.append(spec['group'])
+            names = list(spec.get('metrics') or [name for name in available if name != spec['group']])
+        if not names:
+            names = available
+        for name in names:
+            if name not in required:
+                required.append(name)
+    return required, groups
+
+
+def run_batch_analysis(handle, analyses, include_figures=False, store=None):
+    """
+    对同一数据集批量执行多项分析
+
+    参数:
+    - handle: 共享数据集存储中的数据集句柄
+    - analyses: 分析请求列表，每项为字典，例如
+      {"type": "statistics", "columns": ["a", "b"]}
+      {"type": "correlation", "pairs": [["a", "b"]], "method": "spearman", "permutations": 10000}
+      {"type": "interval", "columns": ["a"], "estimate": "mean", "confidence": 0.95}
+      {"type": "test", "group": "variant", "metrics": ["a", "b"], "test": "welch", "correction": "holm"}
+      省略 columns 时分析全部数值列；相关性省略 pairs 时计算 columns 的全部两两组合；
+      分组列 group 可以是数值列，也可以是取值较少的文本列（如 "A"/"B"/"C"）
+    - include_figures: 是否附带 base64 编码的图表；为 'thumbnail' 时只附带缩略图
+    - store: 数据集存储，默认使用进程内共享的存储
+
+    返回:
+    - 可序列化为 JSON 的结果字典
+    """
+    error = validate_analyses(analyses)
+    if error is not None:
+        return {'dataset': handle, 'error': error}
+
+    if store is None:
+        store = get_dataset_store()
+    store.acquire(handle)
+    try:
+        available = store.columns(handle)
+        required, groups = _required_columns(analyses, available)
+        unknown = [name for name in required if name not in available]
+        if unknown:
+            return {'dataset': handle, 'error': f"数据集中不存在以下数值列: {', '.join(unknown)}"}
+        categories = store.category_columns(handle)
+        unknown = [name for name in groups if name not in available and name not in categories]
+        if unknown:
+            return {'dataset': handle, 'error': f"数据集中不存在以下分组列: {', '.join(unknown)}"}
+
+        # 数值分组列与其他数值列一起读取；分类分组列在检验时按标签读取
+        numeric_groups = [name for name in groups if name in available and name not in required]
+        dataset = _ParsedDataset(handle, required + list(dict.fromkeys(numeric_groups)), store)
+        results = []
+        for spec in analyses:
+            analysis_type = spec.get('type')
+            entry = {'type': analysis_type}
+            try:
+                if analysis_type == 'statistics':
+                    entry['results'] = _run_statistics(dataset, spec, include_figures)
+                elif analysis_type == 'correlation':
+                    entry['results'] = _run_correlation(dataset, spec, include_figures)
+                elif analysis_type == 'interval':
+                    entry['results'] = _run_interval(dataset, spec)
+                elif analysis_type == 'test':
+                    entry['results'] = _run_test(dataset, spec)
+                else:
+                    entry['error'] = f"不支持的分析类型: {analysis_type}。可选: {', '.join(ANALYSIS_TYPES)}"
+            except ValueError as e:
+                entry['error'] = str(e)
+            except TypeError as e:
+                entry['error'] = f"参数类型错误: {e}"
+            results.append(entry)
+
+        return {'dataset': handle, 'rows': store.rows(handle), 'results': results}
+    finally:
+        store.release(handle)
@@ -5,10 +5,42 @@ from scipy import stats
 import math
 # 导入中文字体配置
 import font_config
+from histogram_binning import compute_histogram
+from permutation_test import permutation_test_correlation
+from weighted_stats import (
+    compress_frequency_table, effective_sample_size, summarize_weighted_statistics,
+    valid_weighted_rows, weighted_moments, weighted_quantile
+)
 
 
-def calculate_correlation(df, col_x, col_y, method='pearson'):
-    """计算相关性并生成散点图"""
+def generate_scatter_plot(x_vals, y_vals, col_x, col_y):
+    """生成两列的散点图及回归拟合线"""
+    fig, ax = plt.subplots(figsize=(7, 5))
+    ax.scatter(x_vals, y_vals, alpha=0.7, color='#5B9BD5', label='数据点')
+
+    # 简单线性回归拟合
+    slope, intercept = np.polyfit(x_vals, y_vals, 1)
+    reg_x = np.linspace(np.min(x_vals), np.max(x_vals), 100)
+    reg_y = slope * reg_x + intercept
+    ax.plot(reg_x, reg_y, color='#D9534F', linewidth=2, label='回归拟合线')
+
+    ax.set_xlabel(col_x)
+    ax.set_ylabel(col_y)
+    ax.set_title(f"{col_x} 与 {col_y} 的相关性")
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+    plt.tight_layout()
+    return fig
+
+
+def calculate_correlation(df, col_x, col_y, method='pearson', permutations=0, alpha=0.05, lazy_plot=False):
+    """
+    计算相关性并生成散点图
+
+    permutations 大于0时额外进行置换检验（最多 permutations 次，p 值明显偏离 alpha 时提前停止），
+    样本量很小时穷举全部置换得到精确 p 值。
+    lazy_plot 为真时返回绘制散点图的无参函数而不是图表，交给渲染缓存在未命中时才调用。
+    """
     # 提取需要分析的两列
     series_x = df[col_x].dropna()
     series_y = df[col_y].dropna()
@@ -20,6 +52,8 @@ def calculate_correlation(df, col_x, col_y, method='pearson'):
 
     x_vals = aligned.iloc[:, 0].astype(float)
     y_vals = aligned.iloc[:, 1].astype(float)
+    if x_vals.nunique() < 2 or y_vals.nunique() < 2:
+        return "存在取值全部相同的列，相关系数无定义", None
 
     # 选择相关系数计算方法
     if method == 'spearman':
@@ -30,21 +64,9 @@ def calculate_correlation(df, col_x, col_y, method='pearson'):
         method_label = "Pearson 相关系数"
 
     # 生成散点图及回归拟合线
-    fig, ax = plt.subplots(figsize=(7, 5))
-    ax.scatter(x_vals, y_vals, alpha=0.7, color='#5B9BD5', label='数据点')
-
-    # 简单线性回归拟合
-    slope, intercept = np.polyfit(x_vals, y_vals, 1)
-    reg_x = np.linspace(x_vals.min(), x_vals.max(), 100)
-    reg_y = slope * reg_x + intercept
-    ax.plot(reg_x, reg_y, color='#D9534F', linewidth=2, label='回归拟合线')
-
-    ax.set_xlabel(col_x)
-    ax.set_ylabel(col_y)
-    ax.set_title(f"{col_x} 与 {col_y} 的相关性")
-    ax.legend()
-    ax.grid(True, alpha=0.3)
-    plt.tight_layout()
+    def plot():
+        return generate_scatter_plot(x_vals, y_vals, col_x, col_y)
+    fig = plot if lazy_plot else plot()
 
     result = f"""### {method_label}
 
@@ -53,38 +75,86 @@ def calculate_correlation(df, col_x, col_y, method='pearson'):
 | 样本数 | {len(aligned)} |
 | 相关系数 | {corr_coef:.4f} |
 | p 值 | {p_value:.4f} |
+"""
+
+    if permutations > 0:
+        permutation = permutation_test_correlation(
+            x_vals.values, y_vals.values, method, int(permutations), alpha
+        )
+        if permutation['exact']:
+            note = f"穷举全部 {permutation['permutations']} 种置换（精确）"
+        elif permutation['stopped_early']:
+            note = f"{permutation['permutations']} 次（p 值已明确{'低于' if permutation['p_value'] < alpha else '高于'} {alpha}，提前停止）"
+        else:
+            note = f"{permutation['permutations']} 次"
+        result += f"""| 置换检验 p 值 | {permutation['p_value']:.4f} |
+| 置换次数 | {note} |
+"""
 
+    result += """
 ### 解读
 - |r| 越接近 1，线性关联越强；越接近 0，线性关联越弱
 - p 值越小，拒绝“无相关”原假设的证据越强，通常 p < 0.05 视为显著相关
 - 回归线仅用于趋势参考，非因果关系说明
 """
+    if permutations > 0:
+        result += "- 置换检验不依赖正态性假设，小样本或重尾数据时比渐近 p 值更可靠\n"
 
     return result, fig
 
-def calculate_statistics(data):
-    """计算描述性统计量并返回格式化的结果"""
-    if len(data) == 0:
-        return "数据为空"
+def summarize_statistics(data):
+    """计算描述性统计量，返回字典供结果格式化与绘图复用"""
+    data = np.asarray(data, dtype=float)
 
-    # 基本统计量计算
-    count = len(data)
-    mean = np.mean(data)
-    median = np.median(data)
-    std_dev = np.std(data)
-    min_val = np.min(data)
-    max_val = np.max(data)
-    q1 = np.percentile(data, 25)
-    q3 = np.percentile(data, 75)
+    q1, median, q3 = np.percentile(data, [25, 50, 75])
     iqr = q3 - q1
-    skewness = stats.skew(data)
-    kurtosis = stats.kurtosis(data)
 
     # 检测异常值
     lower_bound = q1 - 1.5 * iqr
     upper_bound = q3 + 1.5 * iqr
-    outliers = [x for x in data if x < lower_bound or x > upper_bound]
-    outlier_count = len(outliers)
+    outlier_count = int(np.count_nonzero((data < lower_bound) | (data > upper_bound)))
+
+    return {
+        'count': len(data),
+        'mean': np.mean(data),
+        'median': median,
+        'std': np.std(data),
+        'min': np.min(data),
+        'max': np.max(data),
+        'q1': q1,
+        'q3': q3,
+        'iqr': iqr,
+        'skewness': stats.skew(data),
+        'kurtosis': stats.kurtosis(data),
+        'outlier_count': outlier_count,
+    }
+
+def calculate_statistics(data, summary=None, weights=None, weight_type='frequency'):
+    """
+    计算描述性统计量并返回格式化的结果
+
+    可传入 summarize_statistics 的结果以避免重复计算；
+    提供 weights 时按加权数据计算，weight_type 见 effective_sample_size。
+    """
+    if len(data) == 0:
+        return "数据为空"
+
+    if summary is None:
+        summary = (summarize_weighted_statistics(data, weights, weight_type)
+                   if weights is not None else summarize_statistics(data))
+
+    count = summary['count']
+    mean = summary['mean']
+    median = summary['median']
+    std_dev = summary['std']
+    min_val = summary['min']
+    max_val = summary['max']
+    q1 = summary['q1']
+    q3 = summary['q3']
+    iqr = summary['iqr']
+    skewness = summary['skewness']
+    kurtosis = summary['kurtosis']
+    outlier_count = summary['outlier_count']
 
     # 格式化结果为Markdown
     result = f"""### 描述性统计结果
@@ -133,25 +203,42 @@ def calculate_statistics(data):
 
     return result
 
-def generate_histogram(data, title="数据分布"):
-    """生成数据直方图"""
+def generate_histogram(data, title="数据分布", rule='auto', summary=None, weights=None):
+    """
+    生成数据直方图
+
+    bin计数由线性时间的分箱函数一次算出，再以阶梯图绘制，matplotlib 不再重新分箱。
+    rule 可选 'auto'、'sturges'、'freedman-diaconis'、'scott'、'doane'；
+    summary 为 summarize_statistics 的结果，提供时复用其中的 IQR 等统计量；
+    weights 为每个取值的频数，用于频数表等预聚合数据。
+    """
+    if weights is not None:
+        data, weights = compress_frequency_table(data, weights)
+    if summary is None:
+        summary = summarize_weighted_statistics(data, weights) if weights is not None else summarize_statistics(data)
+
     fig, ax = plt.subplots(figsize=(8, 5))
 
-    # 计算合适的bin数量 (Sturges规则)
-    bins = int(np.ceil(np.log2(len(data)) + 1))
+    # 计算bin计数并换算为频率密度
+    counts, edges = compute_histogram(data, summary, rule, weights)
+    density = counts / (counts.sum() * np.diff(edges))
 
     # 绘制直方图和核密度估计
-    ax.hist(data, bins=bins, density=True, alpha=0.7, color='#5B9BD5', label='频率分布')
+    ax.stairs(density, edges, fill=True, alpha=0.7, color='#5B9BD5', label='频率分布')
 
     # 添加核密度估计曲线
     if len(data) > 2:  # 至少需要3个点才能计算KDE
-        x = np.linspace(min(data), max(data), 100)
-        kde = stats.gaussian_kde(data)
+        x = np.linspace(summary['min'], summary['max'], 100)
+        if weights is not None:
+            # 加权KDE只在不同取值上求和；带宽按总频数用 Scott 规则确定
+            kde = stats.gaussian_kde(data, bw_method=summary['count'] ** (-1 / 5), weights=weights)
+        else:
+            kde = stats.gaussian_kde(data)
         ax.plot(x, kde(x), 'r-', linewidth=2, label='密度估计')
 
     # 添加均值和中位数线
-    mean = np.mean(data)
-    median = np.median(data)
+    mean = summary['mean']
+    median = summary['median']
     ax.axvline(mean, color='green', linestyle='dashed', linewidth=1.5, label=f'均值: {mean:.2f}')
     ax.axvline(median, color='red', linestyle='dashed', linewidth=1.5, label=f'中位数: {median:.2f}')
 
@@ -165,26 +252,69 @@ def generate_histogram(data, title="数据分布"):
     plt.tight_layout()
     return fig
 
-def generate_boxplot(data, title="数据分布"):
-    """生成箱线图"""
+def generate_histogram_from_counts(counts, edges, title="数据分布"):
+    """
+    由预先算好的bin计数生成直方图
+
+    用于流式累加（HistogramAccumulator）得到的计数，无需原始数据。
+    """
+    counts = np.asarray(counts, dtype=float)
+    edges = np.asarray(edges, dtype=float)
+    density = counts / (counts.sum() * np.diff(edges))
+
     fig, ax = plt.subplots(figsize=(8, 5))
+    ax.stairs(density, edges, fill=True, alpha=0.7, color='#5B9BD5', label='频率分布')
+
+    # 以bin中点近似计算均值
+    centers = (edges[:-1] + edges[1:]) / 2
+    mean = np.average(centers, weights=counts)
+    ax.axvline(mean, color='green', linestyle='dashed', linewidth=1.5, label=f'均值: {mean:.2f}')
+
+    ax.set_title(f'{title}的直方图', fontsize=14)
+    ax.set_xlabel('值', fontsize=12)
+    ax.set_ylabel('频率密度', fontsize=12)
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    return fig
+
+def generate_boxplot(data, title="数据分布", weights=None):
+    """生成箱线图（提供 weights 时按频数加权计算四分位数）"""
+    fig, ax = plt.subplots(figsize=(8, 5))
+
+    if weights is not None:
+        data, weights = compress_frequency_table(data, weights)
+        q1, median, q3 = weighted_quantile(data, weights, [0.25, 0.5, 0.75])
+    else:
+        q1, median, q3 = np.percentile(data, [25, 50, 75])
+    iqr = q3 - q1
+    lower_bound = q1 - 1.5 * iqr
+    upper_bound = q3 + 1.5 * iqr
 
     # 绘制箱线图
-    boxplot = ax.boxplot(data, patch_artist=True, vert=False)
+    if weights is not None:
+        # 加权数据由预先算好的四分位数和须线绘制，不展开原始观测值
+        inside = data[(data >= lower_bound) & (data <= upper_bound)]
+        box_stats = [{
+            'med': median, 'q1': q1, 'q3': q3,
+            'whislo': inside.min(), 'whishi': inside.max(),
+            'fliers': data[(data < lower_bound) | (data > upper_bound)],
+        }]
+        boxplot = ax.bxp(box_stats, patch_artist=True, vert=False)
+    else:
+        boxplot = ax.boxplot(data, patch_artist=True, vert=False)
 
     # 设置箱线图颜色
     for patch in boxplot['boxes']:
         patch.set_facecolor('#5B9BD5')
 
-    # 添加散点图展示数据分布
+    # 添加散点图展示数据分布（加权数据每个取值画一个点，点的面积与频数成正比）
     y = np.random.normal(1, 0.04, size=len(data))
-    ax.scatter(data, y, alpha=0.5, color='#333333')
+    sizes = 20 * weights / weights.max() + 5 if weights is not None else None
+    ax.scatter(data, y, s=sizes, alpha=0.5, color='#333333')
 
     # 计算并标注统计量
-    q1, median, q3 = np.percentile(data, [25, 50, 75])
-    iqr = q3 - q1
-    lower_bound = q1 - 1.5 * iqr
-    upper_bound = q3 + 1.5 * iqr
 
     # 设置图表标题和标签
     ax.set_title(f'{title}的箱线图', fontsize=14)
@@ -200,28 +330,34 @@ def generate_boxplot(data, title="数据分布"):
     plt.tight_layout()
     return fig
 
-def calculate_mean_confidence_interval(data, confidence_level=0.95):
+def calculate_mean_confidence_interval(data, confidence_level=0.95, weights=None, weight_type='frequency'):
     """
     计算样本均值的置信区间
 
     参数:
     - data: 数据数组
     - confidence_level: 置信水平，默认为0.95 (95%)
+    - weights: 每个取值的频数/权重（可选）
+    - weight_type: 'frequency'（样本量为总频数）或 'sampling'（样本量为 Kish 有效样本量）
 
     返回:
     - 均值点估计和置信区间的Markdown格式结果
     """
-    if len(data) < 2:
+    # 样本量
+    n = effective_sample_size(weights, weight_type) if weights is not None else len(data)
+    if n < 2:
         return "样本量不足，无法计算置信区间（至少需要2个观测值）"
 
-    # 计算样本均值（点估计）
-    mean = np.mean(data)
-
-    # 计算样本标准差
-    std_dev = np.std(data, ddof=1)  # 使用无偏估计 (n-1)
+    if weights is not None:
+        # 加权均值与加权方差，方差按样本量做 n/(n-1) 无偏修正
+        mean, m2, _, _ = weighted_moments(np.asarray(data, dtype=float), np.asarray(weights, dtype=float))
+        std_dev = math.sqrt(m2 * n / (n - 1))
+    else:
+        # 计算样本均值（点估计）
+        mean = np.mean(data)
 
-    # 样本量
-    n = len(data)
+        # 计算样本标准差
+        std_dev = np.std(data, ddof=1)  # 使用无偏估计 (n-1)
 
     # 计算标准误
     std_error = std_dev / math.sqrt(n)
@@ -255,7 +391,8 @@ def calculate_mean_confidence_interval(data, confidence_level=0.95):
 
     return result
 
-def calculate_proportion_confidence_interval(data, threshold, confidence_level=0.95):
+def calculate_proportion_confidence_interval(data, threshold, confidence_level=0.95, weights=None,
+                                             weight_type='frequency'):
     """
     计算样本比例的置信区间
 
@@ -263,17 +400,30 @@ def calculate_proportion_confidence_interval(data, threshold, confidence_level=0
     - data: 数据数组
     - threshold: 阈值，用于确定成功/失败（大于等于阈值为成功）
     - confidence_level: 置信水平，默认为0.95 (95%)
+    - weights: 每个取值的频数/权重（可选）
+    - weight_type: 'frequency'（样本量为总频数）或 'sampling'（样本量为 Kish 有效样本量）
 
     返回:
     - 比例点估计和置信区间的Markdown格式结果
     """
-    if len(data) < 30:
+    data = np.asarray(data, dtype=float)
+    n = effective_sample_size(weights, weight_type) if weights is not None else len(data)
+    if n < 30:
         return "样本量不足，建议使用至少30个观测值来估计比例的置信区间"
 
     # 计算样本比例（点估计）
-    successes = sum(1 for x in data if x >= threshold)
-    n = len(data)
-    p_hat = successes / n
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float)
+        # 成功数与总数直接由权重求和，避免 p_hat * n 的浮点误差
+        successes = weights[data >= threshold].sum()
+        total = weights.sum()
+        p_hat = successes / total
+        successes, total = (f"{value:.0f}" if value == round(value) else f"{value:.2f}"
+                            for value in (successes, total))
+    else:
+        successes = int(np.count_nonzero(data >= threshold))
+        total = n
+        p_hat = successes / n
 
     # 计算标准误
     std_error = math.sqrt((p_hat * (1 - p_hat)) / n)
@@ -293,7 +443,7 @@ def calculate_proportion_confidence_interval(data, threshold, confidence_level=0
 | 估计类型 | 值 |
 |--------|----|
 | 阈值 | {threshold:.4f} |
-| 样本比例 (点估计) | {p_hat:.4f} ({successes}/{n}) |
+| 样本比例 (点估计) | {p_hat:.4f} ({successes}/{total}) |
 | 标准误 | {std_error:.4f} |
 | 置信区间下限 | {lower_bound:.4f} |
 | 置信区间上限 | {upper_bound:.4f} |
@@ -308,7 +458,8 @@ def calculate_proportion_confidence_interval(data, threshold, confidence_level=0
 
     return result
 
-def calculate_parameter_estimates(data, estimate_type, confidence_level=0.95, threshold=None):
+def calculate_parameter_estimates(data, estimate_type, confidence_level=0.95, threshold=None, weights=None,
+                                  weight_type='frequency'):
     """
     计算参数估计（点估计和区间估计）
 
@@ -317,6 +468,8 @@ def calculate_parameter_estimates(data, estimate_type, confidence_level=0.95, th
     - estimate_type: 估计类型 ('mean' 或 'proportion')
     - confidence_level: 置信水平，默认为0.95 (95%)
     - threshold: 用于比例估计的阈值，仅当estimate_type='proportion'时使用
+    - weights: 每个取值的频数/权重（可选），用于频数表等预聚合数据
+    - weight_type: 'frequency'（频数表，样本量为总频数 Σw）或 'sampling'（抽样权重，样本量为 Kish 有效样本量）
 
     返回:
     - 参数估计的Markdown格式结果
@@ -324,12 +477,19 @@ def calculate_parameter_estimates(data, estimate_type, confidence_level=0.95, th
     if len(data) == 0:
         return "数据为空，无法进行参数估计"
 
+    if weights is not None:
+        # 不合并相同取值：抽样权重的 Kish 有效样本量需要原始权重
+        data, weights = valid_weighted_rows(data, weights)
+        if len(data) == 0:
+            return "数据为空，无法进行参数估计"
+
     if estimate_type == 'mean':
-        return calculate_mean_confidence_interval(data, confidence_level)
+        return calculate_mean_confidence_interval(data, confidence_level, weights, weight_type)
     elif estimate_type == 'proportion':
         if threshold is None:
             # 如果未提供阈值，使用数据的中位数作为默认阈值
-            threshold = np.median(data)
-        return calculate_proportion_confidence_interval(data, threshold, confidence_level)
+            threshold = (weighted_quantile(*compress_frequency_table(data, weights), 0.5)
+                         if weights is not None else np.median(data))
+        return calculate_proportion_confidence_interval(data, threshold, confidence_level, weights, weight_type)
     else:
         return f"不支持的估计类型: {estimate_type}。请选择 'mean' 或 'proportion'。"
\ No newline at end of file
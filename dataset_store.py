@@ -0,0 +1,280 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import uuid
+import numpy as np
+import pandas as pd
+
+
+# 数据集存储目录，可通过环境变量 STATEASE_STORE_DIR 指定
+DEFAULT_STORE_DIR = os.getenv(
+    "STATEASE_STORE_DIR", os.path.join(tempfile.gettempdir(), "statease_store")
+)
+# 计算内容哈希时每次读取的字节数
+HASH_BLOCK_SIZE = 1 << 20
+META_FILE = "meta.json"
+# 存储自己创建的目录：数据集目录（内容哈希）与写入中的临时目录（.哈希.随机ID）
+STORE_ENTRY_PATTERN = re.compile(r"(?:[0-9a-f]{64}|\.[0-9a-f]{64}\.[0-9a-f]{32})")
+# 非数值列不同取值不超过此数量时作为分类列（例如分组标签）保存
+MAX_CATEGORIES = 1000
+
+
+def hash_file(path):
+    """计算文件内容的 SHA-256 哈希，作为数据集句柄"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_meta(root, handle):
+    """读取数据集的元信息（列名、行数），数据集不存在时抛出 KeyError"""
+    meta_path = os.path.join(root, handle, META_FILE)
+    if not os.path.exists(meta_path):
+        raise KeyError(handle)
+    with open(meta_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def attach_column(root, handle, name, meta=None):
+    """
+    以只读内存映射方式打开数据集中的某一列，不把整列读入内存
+
+    分类列返回类别编号（浮点数，缺失为 NaN），标签见 meta['categories']。
+    """
+    if meta is None:
+        meta = load_meta(root, handle)
+    if name in meta.get('categories', {}):
+        filename = f"g{list(meta['categories']).index(name)}.npy"
+    else:
+        filename = f"{meta['columns'].index(name)}.npy"
+    return np.load(os.path.join(root, handle, filename), mmap_mode='r')
+
+
+class DatasetStore:
+    """
+    服务端共享数据集存储（单进程）
+
+    - 每个上传的数据集按内容哈希去重，只解析、存储一次
+    - 数值列保存为 .npy 文件，读取时以内存映射方式打开，同一进程内的会话共享同一份数据
+    - 取值较少的非数值列（如分组标签）保存为类别编号与标签表
+    - 由数据集派生的结果（如分组充分统计量）可通过 cached 缓存，随数据集一起释放
+    - 会话只持有数据集句柄（字符串），不再把 DataFrame 放进 gr.State
+    - 引用计数保存在本进程内存中，最后一个持有者释放后删除对应文件；
+      因此一个存储目录只能由一个进程使用，多个服务实例应通过 STATEASE_STORE_DIR 指定不同目录
+    - 启动时清理目录中上次运行遗留的数据集（它们已不可能被任何持有者引用）；
+      只删除名称符合存储自身命名规则的目录，目录中的其他内容不受影响
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._refcounts = {}
+        self._owners = {}
+        self._meta = {}
+        self._derived = {}
+        self._sweep()
+
+    def _sweep(self):
+        """删除上次运行遗留的数据集目录与未完成的临时目录"""
+        for entry in os.listdir(self.root):
+            path = os.path.join(self.root, entry)
+            if STORE_ENTRY_PATTERN.fullmatch(entry) and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _write_dataset(self, path, handle):
+        """解析CSV并把数值列与分类列写入临时目录，完成后原子地重命名为正式目录"""
+        df = pd.read_csv(path)
+        numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
+
+        staging = os.path.join(self.root, f".{handle}.{uuid.uuid4().hex}")
+        os.makedirs(staging)
+        for index, name in enumerate(numeric_cols):
+            np.save(os.path.join(staging, f"{index}.npy"), df[name].to_numpy(dtype=float))
+
+        categories = {}
+        for name in df.columns:
+            if name in numeric_cols or df[name].nunique() > MAX_CATEGORIES:
+                continue
+            codes, labels = pd.factorize(df[name], sort=True)
+            np.save(os.path.join(staging, f"g{len(categories)}.npy"),
+                    np.where(codes < 0, np.nan, codes).astype(float))
+            categories[str(name)] = [str(label) for label in labels]
+
+        meta = {
+            'name': os.path.basename(path),
+            'rows': len(df),
+            'columns': [str(name) for name in numeric_cols],
+            'categories': categories,
+        }
+        with open(os.path.join(staging, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+        try:
+            os.rename(staging, os.path.join(self.root, handle))
+        except OSError:
+            # 其他线程已写入同一数据集，直接复用
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def put_file(self, path, owner=None):
+        """
+        登记CSV文件并返回数据集句柄
+
+        参数:
+        - path: CSV文件路径
+        - owner: 持有者标识（例如会话ID）；同一持有者再次登记时自动释放其之前的数据集
+
+        返回:
+        - 数据集句柄；调用方持有一个引用，不再使用时应调用 release
+          （提供 owner 时也可以调用 release_owner）
+        """
+        handle = hash_file(path)
+        while True:
+            with self._lock:
+                if handle in self._meta:
+                    self._add_reference_locked(handle, owner)
+                    return handle
+
+            # 解析与写入较慢，在锁外进行，不阻塞其他会话读取已有数据集
+            try:
+                meta = load_meta(self.root, handle)
+            except KeyError:
+                self._write_dataset(path, handle)
+                meta = load_meta(self.root, handle)
+
+            with self._lock:
+                if handle not in self._meta:
+                    # 写入期间数据集可能刚被最后一个持有者释放并删除，此时重新写入
+                    if not os.path.isdir(os.path.join(self.root, handle)):
+                        continue
+                    self._meta[handle] = meta
+                self._add_reference_locked(handle, owner)
+                return handle
+
+    def _add_reference_locked(self, handle, owner):
+        self._refcounts[handle] = self._refcounts.get(handle, 0) + 1
+        if owner is not None:
+            previous = self._owners.get(owner)
+            self._owners[owner] = handle
+            if previous is not None:
+                self._release_locked(previous)
+
+    def acquire(self, handle):
+        """增加数据集的引用计数（例如提交后台任务前）"""
+        with self._lock:
+            if handle not in self._meta:
+                raise KeyError(handle)
+            self._refcounts[handle] += 1
+
+    def release(self, handle):
+        """减少数据集的引用计数，降为0时删除该数据集"""
+        with self._lock:
+            self._release_locked(handle)
+
+    def release_owner(self, owner):
+        """释放某个持有者（例如已断开的会话）持有的数据集"""
+        with self._lock:
+            handle = self._owners.pop(owner, None)
+            if handle is not None:
+                self._release_locked(handle)
+
+    def _release_locked(self, handle):
+        if handle not in self._refcounts:
+            return
+        self._refcounts[handle] -= 1
+        if self._refcounts[handle] <= 0:
+            del self._refcounts[handle]
+            self._meta.pop(handle, None)
+            self._derived.pop(handle, None)
+            shutil.rmtree(os.path.join(self.root, handle), ignore_errors=True)
+
+    def columns(self, handle):
+        """返回数据集的数值列名列表"""
+        with self._lock:
+            if handle not in self._meta:
+                raise KeyError(handle)
+            return list(self._meta[handle]['columns'])
+
+    def category_columns(self, handle):
+        """返回数据集的分类列名列表"""
+        with self._lock:
+            if handle not in self._meta:
+                raise KeyError(handle)
+            return list(self._meta[handle].get('categories', {}))
+
+    def labels(self, handle, name):
+        """返回分类列的标签列表，类别编号即标签的下标"""
+        with self._lock:
+            if handle not in self._meta:
+                raise KeyError(handle)
+            return list(self._meta[handle]['categories'][name])
+
+    def rows(self, handle):
+        """返回数据集的行数"""
+        with self._lock:
+            if handle not in self._meta:
+                raise KeyError(handle)
+            return self._meta[handle]['rows']
+
+    def cached(self, handle, key, compute):
+        """
+        返回由数据集派生、按 key 缓存的结果，未命中时调用 compute() 计算
+
+        计算在锁外进行；数据集被删除时缓存一并清除。
+        """
+        with self._lock:
+            if handle not in self._meta:
+                raise KeyError(handle)
+            derived = self._derived.setdefault(handle, {})
+            if key in derived:
+                return derived[key]
+        value = compute()
+        with self._lock:
+            if handle in self._meta:
+                self._derived.setdefault(handle, {})[key] = value
+        return value
+
+    def column(self, handle, name):
+        """以内存映射方式返回某一列的数据"""
+        with self._lock:
+            if handle not in self._meta:
+                raise KeyError(handle)
+            meta = self._meta[handle]
+        return attach_column(self.root, handle, name, meta)
+
+    def decoded_column(self, handle, name):
+        """返回某一列的取值：数值列为内存映射数组，分类列还原为标签（缺失为 None）"""
+        values = self.column(handle, name)
+        if name not in self.category_columns(handle):
+            return values
+        labels = np.asarray(self.labels(handle, name) + [None], dtype=object)
+        return labels[np.where(np.isnan(values), -1, values).astype(np.intp)]
+
+    def frame(self, handle, columns=None):
+        """返回由内存映射列组成的 DataFrame（分类列还原为标签）"""
+        if columns is None:
+            columns = self.columns(handle)
+        return pd.DataFrame({name: self.decoded_column(handle, name) for name in columns}, copy=False)
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_dataset_store():
+    """
+    返回进程内共享的默认存储实例（存储目录只能由一个进程使用）
+
+    首次调用时才创建并清理存储目录，仅导入模块（例如脚本或测试）不会影响正在运行的服务。
+    """
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            _default_store = DatasetStore()
+        return _default_store
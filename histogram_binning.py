@@ -0,0 +1,185 @@
+import numpy as np
+
+
+# 支持的分箱规则
+HISTOGRAM_RULES = ('auto', 'sturges', 'freedman-diaconis', 'scott', 'doane')
+# bin数量上限，避免IQR极小而极差很大时生成过多的bin
+MAX_BINS = 10_000
+
+
+def histogram_bin_count(n, data_range, rule='auto', iqr=None, std=None, skewness=None):
+    """
+    按指定规则计算直方图的bin数量
+
+    参数:
+    - n: 样本量
+    - data_range: 数据极差 (最大值 - 最小值)
+    - rule: 分箱规则，可选 'auto'、'sturges'、'freedman-diaconis'、'scott'、'doane'
+    - iqr: 四分位距，Freedman–Diaconis 规则使用
+    - std: 标准差，Scott 规则使用
+    - skewness: 偏度，Doane 规则使用
+
+    返回:
+    - bin数量（至少为1）
+    """
+    if rule not in HISTOGRAM_RULES:
+        raise ValueError(f"不支持的分箱规则: {rule}。可选: {', '.join(HISTOGRAM_RULES)}")
+    if n < 1:
+        return 1
+
+    sturges = int(np.ceil(np.log2(n) + 1))
+
+    def bins_for_width(width):
+        # 宽度为0（数据集中在少数几个值上）时退回 Sturges 规则
+        if not width or width <= 0 or data_range <= 0:
+            return sturges
+        return int(np.ceil(data_range / width))
+
+    if rule == 'sturges':
+        bins = sturges
+    elif rule == 'freedman-diaconis':
+        bins = bins_for_width(2.0 * iqr * n ** (-1 / 3))
+    elif rule == 'scott':
+        bins = bins_for_width((24.0 * np.sqrt(np.pi) / n) ** (1 / 3) * std)
+    elif rule == 'doane':
+        if n > 2 and np.isfinite(skewness):
+            sigma_g1 = np.sqrt(6.0 * (n - 2) / ((n + 1.0) * (n + 3)))
+            bins = int(np.ceil(1 + np.log2(n) + np.log2(1 + abs(skewness) / sigma_g1)))
+        else:
+            bins = sturges
+    else:  # auto: 取 Sturges 与 Freedman–Diaconis 中较大者，兼顾小样本与大样本
+        bins = max(sturges, bins_for_width(2.0 * iqr * n ** (-1 / 3)))
+
+    return int(min(max(bins, 1), MAX_BINS))
+
+
+def histogram_edges(min_val, max_val, bins):
+    """生成等宽bin边界，极差为0时以该值为中心展开一个单位宽度"""
+    if max_val <= min_val:
+        min_val, max_val = min_val - 0.5, max_val + 0.5
+    return np.linspace(min_val, max_val, bins + 1)
+
+
+def bin_counts(data, edges, weights=None):
+    """
+    线性时间的等宽分箱计数
+
+    直接由 (x - 下界) / 宽度 计算bin编号再用 bincount 汇总，不需要排序或二分查找。
+    落在 [edges[0], edges[-1]] 之外的值不计入；最大值归入最后一个bin（与 np.histogram 一致）。
+    """
+    data = np.asarray(data, dtype=float)
+    bins = len(edges) - 1
+    lo, hi = edges[0], edges[-1]
+
+    inside = (data >= lo) & (data <= hi)
+    if not inside.all():
+        data = data[inside]
+        if weights is not None:
+            weights = np.asarray(weights, dtype=float)[inside]
+
+    index = ((data - lo) * (bins / (hi - lo))).astype(np.intp)
+    np.minimum(index, bins - 1, out=index)
+    return np.bincount(index, weights=weights, minlength=bins)
+
+
+class HistogramAccumulator:
+    """
+    分块累加的直方图计数器，用于只能流式扫描一遍的数据（如滚动分析的数据流）
+
+    bin落在以 origin 为起点、宽度为 width 的网格上，第k个bin为
+    [origin + k·width, origin + (k+1)·width)。宽度由第一块数据按 auto 分箱规则确定；
+    之后的数据超出当前范围时向两侧追加bin，bin数量超过上限时相邻两个bin合并、
+    宽度加倍。网格对齐保证合并是精确的，因此无需预先知道数据范围。
+    """
+
+    def __init__(self, max_bins=1000):
+        self.max_bins = int(max_bins)
+        self.origin = None
+        self.width = None
+        self.start = 0  # 第一个bin在网格上的编号
+        self.counts = np.zeros(0)
+
+    def _initialize(self, data):
+        lo, hi = data.min(), data.max()
+        if hi <= lo:
+            self.origin, self.width = lo - 0.5, 1.0
+            return
+        q1, q3 = np.percentile(data, [25, 75])
+        bins = histogram_bin_count(len(data), hi - lo, 'auto', iqr=q3 - q1)
+        self.origin, self.width = lo, (hi - lo) / min(bins, self.max_bins)
+
+    def _coarsen(self):
+        """相邻两个bin合并，宽度加倍"""
+        counts = self.counts
+        if self.start % 2:
+            counts = np.concatenate([[0.0], counts])
+        if len(counts) % 2:
+            counts = np.concatenate([counts, [0.0]])
+        self.counts = counts.reshape(-1, 2).sum(axis=1)
+        self.start = self.start // 2
+        self.width *= 2
+
+    def update(self, chunk, weights=None):
+        chunk = np.asarray(chunk, dtype=float)
+        valid = np.isfinite(chunk)
+        if not valid.all():
+            chunk = chunk[valid]
+            if weights is not None:
+                weights = np.asarray(weights, dtype=float)[valid]
+        if len(chunk) == 0:
+            return self
+        if self.origin is None:
+            self._initialize(chunk)
+
+        low, high = chunk.min() - self.origin, chunk.max() - self.origin
+        if not (np.isfinite(low) and np.isfinite(high)):
+            raise ValueError("数据范围超出浮点数可表示的范围，无法累加直方图")
+
+        # 先按浮点数判断所需范围，超出上限时逐步加倍宽度，避免编号溢出；
+        # 每次加倍后由数据重新计算编号（编号本身可能因溢出为 inf，不能直接减半）
+        while True:
+            lo, hi = np.floor(low / self.width), np.floor(high / self.width)
+            first, last = min(lo, self.start), max(hi, self.start + len(self.counts) - 1)
+            if last - first + 1 <= self.max_bins:
+                break
+            self._coarsen()
+
+        first, last = int(first), int(last)
+        counts = np.zeros(last - first + 1)
+        counts[self.start - first:self.start - first + len(self.counts)] = self.counts
+        index = np.floor((chunk - self.origin) / self.width).astype(np.int64) - first
+        # 恰好落在边界上的浮点舍入可能使编号偏出一格
+        np.clip(index, 0, len(counts) - 1, out=index)
+        counts += np.bincount(index, weights=weights, minlength=len(counts))
+        self.counts, self.start = counts, first
+        return self
+
+    @property
+    def edges(self):
+        return self.origin + self.width * np.arange(self.start, self.start + len(self.counts) + 1)
+
+    @property
+    def total(self):
+        return self.counts.sum()
+
+
+def compute_histogram(data, summary, rule='auto', weights=None):
+    """
+    计算直方图的计数与bin边界
+
+    参数:
+    - data: 数据数组
+    - summary: summarize_statistics 返回的统计量字典，直接复用其中的
+      样本量、极值、IQR、标准差与偏度，不再重新扫描数据
+    - rule: 分箱规则
+    - weights: 每个数据点的权重（可选）
+
+    返回:
+    - (counts, edges)
+    """
+    data_range = summary['max'] - summary['min']
+    bins = histogram_bin_count(summary['count'], data_range, rule,
+                               iqr=summary['iqr'], std=summary['std'],
+                               skewness=summary['skewness'])
+    edges = histogram_edges(summary['min'], summary['max'], bins)
+    return bin_counts(data, edges, weights), edges
@@ -0,0 +1,290 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+
+HYPOTHESIS_TESTS = ('welch', 'mann-whitney', 'proportion', 'anova')
+CORRECTION_METHODS = ('none', 'holm', 'bh')
+
+
+def group_sufficient_statistics(df, group_col, metric_cols, threshold=None):
+    """
+    一次扫描计算每个分组、每个指标的充分统计量
+
+    参数:
+    - df: 原始数据
+    - group_col: 分组列
+    - metric_cols: 指标列列表
+    - threshold: 提供时额外统计每组中 >= threshold 的观测数（用于比例检验）
+
+    返回:
+    - 字典，包含 groups（分组标签）、形状为 (分组数, 指标数) 的 n、mean、var（无偏）、successes，
+      以及 binary（每个指标的非缺失值是否全为0或1，用于未提供阈值的比例检验）
+    """
+    grouped = df.groupby(group_col, sort=True)[metric_cols]
+    summary = {
+        'groups': list(grouped.groups.keys()),
+        'metrics': list(metric_cols),
+        'n': grouped.count().to_numpy(dtype=float),
+        'mean': grouped.mean().to_numpy(dtype=float),
+        'var': grouped.var(ddof=1).to_numpy(dtype=float),
+        'binary': (df[metric_cols].isin([0, 1]) | df[metric_cols].isna()).all().to_numpy(),
+    }
+    if threshold is not None:
+        indicator = (df[metric_cols] >= threshold).where(df[metric_cols].notna())
+        summary['successes'] = indicator.groupby(df[group_col], sort=True).sum().to_numpy(dtype=float)
+    return summary
+
+
+def welch_t_test(n1, mean1, var1, n2, mean2, var2):
+    """
+    Welch t 检验（方差不齐的两样本 t 检验），所有参数均可为同形状数组
+
+    返回:
+    - (t 统计量, Welch–Satterthwaite 自由度, 双侧 p 值)
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        se1 = var1 / n1
+        se2 = var2 / n2
+        t = (mean1 - mean2) / np.sqrt(se1 + se2)
+        df = (se1 + se2) ** 2 / (se1 ** 2 / (n1 - 1) + se2 ** 2 / (n2 - 1))
+    p = 2 * stats.t.sf(np.abs(t), df)
+    return t, df, p
+
+
+def two_proportion_z_test(x1, n1, x2, n2):
+    """
+    两比例 z 检验（合并比例估计标准误），所有参数均可为同形状数组
+
+    返回:
+    - (z 统计量, 双侧 p 值)
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p1 = x1 / n1
+        p2 = x2 / n2
+        pooled = (x1 + x2) / (n1 + n2)
+        z = (p1 - p2) / np.sqrt(pooled * (1 - pooled) * (1 / n1 + 1 / n2))
+    p = 2 * stats.norm.sf(np.abs(z))
+    return z, p
+
+
+def one_way_anova(n, mean, var):
+    """
+    由各组充分统计量计算单因素方差分析
+
+    参数:
+    - n, mean, var: 形状为 (分组数, 指标数) 的数组，var 为组内无偏方差
+
+    返回:
+    - (F 统计量, 组间自由度, 组内自由度, p 值)，均为长度为指标数的数组
+    """
+    n = np.asarray(n, dtype=float)
+    valid = n > 0
+    groups = valid.sum(axis=0)
+    total = n.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        grand_mean = np.nansum(n * mean, axis=0) / total
+        between = np.nansum(n * (mean - grand_mean) ** 2, axis=0)
+        within = np.nansum(np.where(n > 1, (n - 1) * var, 0.0), axis=0)
+        df_between = groups - 1
+        df_within = total - groups
+        f = (between / df_between) / (within / df_within)
+    p = stats.f.sf(f, df_between, df_within)
+    return f, df_between, df_within, p
+
+
+def mann_whitney_u_test(a, b):
+    """
+    Mann–Whitney U 检验，对二维数组的每一列（指标）同时计算
+
+    参数:
+    - a, b: 形状为 (观测数, 指标数) 的两组数据，可含NaN
+
+    返回:
+    - (U 统计量, 双侧 p 值)，均为长度为指标数的数组
+    """
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    if not (np.isnan(a).any() or np.isnan(b).any()):
+        result = stats.mannwhitneyu(a, b, alternative='two-sided', axis=0)
+        return np.asarray(result.statistic, dtype=float), np.asarray(result.pvalue, dtype=float)
+
+    # 含缺失值的指标逐列去除NaN后计算
+    u = np.full(a.shape[1], np.nan)
+    p = np.full(a.shape[1], np.nan)
+    for j in range(a.shape[1]):
+        x = a[:, j][~np.isnan(a[:, j])]
+        y = b[:, j][~np.isnan(b[:, j])]
+        if len(x) and len(y):
+            result = stats.mannwhitneyu(x, y, alternative='two-sided')
+            u[j], p[j] = result.statistic, result.pvalue
+    return u, p
+
+
+def adjust_p_values(p_values, method='holm'):
+    """
+    多重比较校正
+
+    参数:
+    - p_values: p 值数组（NaN 不参与校正并原样返回）
+    - method: 'holm'（Holm–Bonferroni，控制族错误率）、'bh'（Benjamini–Hochberg，控制错误发现率）或 'none'
+
+    返回:
+    - 与输入同形状的校正后 p 值
+    """
+    if method not in CORRECTION_METHODS:
+        raise ValueError(f"不支持的校正方法: {method}。可选: {', '.join(CORRECTION_METHODS)}")
+    p_values = np.asarray(p_values, dtype=float)
+    adjusted = p_values.copy()
+    if method == 'none':
+        return adjusted
+
+    flat = p_values.ravel()
+    valid = np.flatnonzero(~np.isnan(flat))
+    m = len(valid)
+    if m == 0:
+        return adjusted
+
+    order = valid[np.argsort(flat[valid])]
+    ranked = flat[order]
+    if method == 'holm':
+        corrected = np.maximum.accumulate((m - np.arange(m)) * ranked)
+    else:  # bh
+        corrected = np.minimum.accumulate((m / np.arange(m, 0, -1) * ranked[::-1]))[::-1]
+
+    result = adjusted.ravel()
+    result[order] = np.minimum(corrected, 1.0)
+    return result.reshape(p_values.shape)
+
+
+def compare_groups(df, group_col, metric_cols, test='welch', correction='holm',
+                   control=None, threshold=None, summary=None):
+    """
+    多指标、多分组的批量假设检验
+
+    两样本检验（welch、mann-whitney、proportion）把每个分组分别与对照组比较，
+    anova 对每个指标检验全部分组均值是否相等。Welch、比例检验与方差分析只使用
+    各组的 n、均值、方差（或成功数），提供 summary 时直接复用，不再扫描原始数据。
+
+    参数:
+    - df: 原始数据（仅 mann-whitney 或未提供 summary 时需要）
+    - group_col: 分组列
+    - metric_cols: 指标列列表
+    - test: 'welch'、'mann-whitney'、'proportion' 或 'anova'
+    - correction: 多重比较校正方法 'holm'、'bh' 或 'none'
+    - control: 对照组标签，默认取排序后的第一个分组
+    - threshold: 比例检验中判定"成功"的阈值；不提供时指标须为0/1变量（否则抛出 ValueError），成功数由 n×均值得到
+    - summary: group_sufficient_statistics 的结果（可选）
+
+    返回:
+    - 每个 (指标, 分组) 组合一行的检验结果 DataFrame
+    """
+    if test not in HYPOTHESIS_TESTS:
+        raise ValueError(f"不支持的检验方法: {test}。可选: {', '.join(HYPOTHESIS_TESTS)}")
+    metric_cols = list(metric_cols)
+    if summary is None:
+        summary = group_sufficient_statistics(df, group_col, metric_cols,
+                                              threshold if test == 'proportion' else None)
+    groups = summary['groups']
+    metric_index = [summary['metrics'].index(name) for name in metric_cols]
+    n = summary['n'][:, metric_index]
+    mean = summary['mean'][:, metric_index]
+    var = summary['var'][:, metric_index]
+    if len(groups) < 2:
+        raise ValueError("至少需要两个分组才能进行检验")
+
+    if test == 'anova':
+        f, df_between, df_within, p = one_way_anova(n, mean, var)
+        frame = pd.DataFrame({
+            'metric': metric_cols,
+            'groups': len(groups),
+            'statistic': f,
+            'df_between': df_between,
+            'df_within': df_within,
+            'p_value': p,
+        })
+        frame['p_adjusted'] = adjust_p_values(frame['p_value'].to_numpy(), correction)
+        return frame
+
+    if control is None:
+        control = groups[0]
+    if control not in groups:
+        raise ValueError(f"对照组 {control} 不存在。可选分组: {', '.join(str(g) for g in groups)}")
+    c = groups.index(control)
+    others = [i for i in range(len(groups)) if i != c]
+
+    # 形状为 (对比数, 指标数) 的数组，一次计算全部组合
+    n1, n2 = n[others], n[[c]]
+    mean1, mean2 = mean[others], mean[[c]]
+    degrees = np.full(n1.shape, np.nan)
+    if test == 'welch':
+        statistic, degrees, p = welch_t_test(n1, mean1, var[others], n2, mean2, var[[c]])
+        effect = mean1 - mean2
+    elif test == 'proportion':
+        if threshold is None:
+            binary = summary['binary'][metric_index]
+            if not binary.all():
+                invalid = [name for name, ok in zip(metric_cols, binary) if not ok]
+                raise ValueError(f"未提供阈值时比例检验的指标应为0/1变量，以下指标含其他取值: {', '.join(invalid)}")
+        successes = summary['successes'][:, metric_index] if threshold is not None else n * mean
+        statistic, p = two_proportion_z_test(successes[others], n1, successes[[c]], n2)
+        effect = successes[others] / n1 - successes[[c]] / n2
+    else:  # mann-whitney 需要原始数据（基于秩）
+        labels = df[group_col]
+        control_values = df.loc[labels == control, metric_cols].to_numpy(dtype=float)
+        statistic = np.empty(n1.shape)
+        p = np.empty(n1.shape)
+        for row, i in enumerate(others):
+            group_values = df.loc[labels == groups[i], metric_cols].to_numpy(dtype=float)
+            statistic[row], p[row] = mann_whitney_u_test(group_values, control_values)
+        effect = mean1 - mean2
+
+    frame = pd.DataFrame({
+        'metric': np.tile(metric_cols, len(others)),
+        'group': np.repeat([groups[i] for i in others], len(metric_cols)),
+        'control': control,
+        'n_group': n1.ravel(),
+        'n_control': np.broadcast_to(n2, n1.shape).ravel(),
+        'difference': np.broadcast_to(effect, n1.shape).ravel(),
+        'statistic': statistic.ravel(),
+        'df': np.broadcast_to(degrees, n1.shape).ravel(),
+        'p_value': p.ravel(),
+    })
+    frame['p_adjusted'] = adjust_p_values(frame['p_value'].to_numpy(), correction)
+    return frame
+
+
+def format_test_results(frame, test, correction, alpha=0.05):
+    """把 compare_groups 的结果格式化为Markdown表格"""
+    test_labels = {
+        'welch': "Welch t 检验",
+        'mann-whitney': "Mann–Whitney U 检验",
+        'proportion': "两比例 z 检验",
+        'anova': "单因素方差分析",
+    }
+    correction_labels = {'none': "不校正", 'holm': "Holm", 'bh': "Benjamini–Hochberg"}
+
+    result = f"""### {test_labels[test]}（多重比较校正: {correction_labels[correction]}）
+
+"""
+    if test == 'anova':
+        result += "| 指标 | 分组数 | F | 自由度 | p 值 | 校正 p 值 | 显著 |\n|------|------|------|------|------|------|------|\n"
+        for row in frame.itertuples():
+            significant = "是" if row.p_adjusted < alpha else "否"
+            result += (f"| {row.metric} | {row.groups} | {row.statistic:.4f} | ({row.df_between:.0f}, {row.df_within:.0f}) | "
+                       f"{row.p_value:.4f} | {row.p_adjusted:.4f} | {significant} |\n")
+    else:
+        result += "| 指标 | 分组 | 对照组 | 差值 | 统计量 | p 值 | 校正 p 值 | 显著 |\n|------|------|------|------|------|------|------|------|\n"
+        for row in frame.itertuples():
+            significant = "是" if row.p_adjusted < alpha else "否"
+            result += (f"| {row.metric} | {row.group} | {row.control} | {row.difference:.4f} | "
+                       f"{row.statistic:.4f} | {row.p_value:.4f} | {row.p_adjusted:.4f} | {significant} |\n")
+
+    significant_count = int((frame['p_adjusted'] < alpha).sum())
+    result += f"""
+### 解读
+- 共进行 {len(frame)} 次检验，校正后在 α = {alpha} 水平下显著的有 {significant_count} 项
+- Holm 校正控制族错误率（至少一次误报的概率），Benjamini–Hochberg 校正控制错误发现率，适合指标较多的场景
+- 差值为分组减对照组（均值或比例）；Mann–Whitney 检验比较的是分布位置，不依赖正态假设
+"""
+    return result
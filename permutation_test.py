@@ -0,0 +1,185 @@
+import itertools
+import math
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from scipy import stats
+
+
+# 每批置换矩阵的元素上限（批大小 × 样本量），控制单次矩阵运算的内存占用
+PERMUTATION_BATCH_ELEMENTS = 2_000_000
+# 每个并行任务包含的置换次数
+PERMUTATIONS_PER_TASK = 5_000
+# 全部置换数不超过此值时直接穷举，得到精确 p 值
+EXACT_PERMUTATION_LIMIT = 50_000
+# 计算量（置换次数 × 样本量）低于此值时在当前进程内完成，避免进程池开销
+PARALLEL_MIN_WORK = 20_000_000
+# 提前停止时 p 值置信区间的置信水平
+EARLY_STOP_CONFIDENCE = 0.99
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def _get_executor(workers):
+    """
+    按进程数惰性创建并复用进程池，避免每次检验都启动新进程
+
+    服务进程是多线程的，直接 fork 可能让子进程继承被其他线程持有的锁而死锁，
+    因此工作进程由 forkserver（不支持时用 spawn）启动。
+    """
+    with _executors_lock:
+        if workers not in _executors:
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _executors[workers] = ProcessPoolExecutor(max_workers=workers,
+                                                      mp_context=multiprocessing.get_context(method))
+        return _executors[workers]
+
+
+def _standardize_pair(x, y, method):
+    """
+    Spearman 只在开始时排秩一次；随后两列标准化，相关系数即点积均值
+
+    任一列为常数（方差为0）时相关系数无定义，返回 None。
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if method == 'spearman':
+        x, y = stats.rankdata(x), stats.rankdata(y)
+    x = x - x.mean()
+    y = y - y.mean()
+    norm_x, norm_y = np.sqrt(np.dot(x, x)), np.sqrt(np.dot(y, y))
+    if norm_x == 0 or norm_y == 0:
+        return None
+    return x / norm_x, y / norm_y
+
+
+def _count_extreme_permutations(zx, zy, observed, n_permutations, seed):
+    """
+    生成 n_permutations 次随机置换，返回 |r| 不小于观测值的次数
+
+    每批把 zy 广播为多行并逐行洗牌，再用一次矩阵-向量乘法得到整批相关系数。
+    """
+    rng = np.random.default_rng(seed)
+    n = len(zx)
+    batch_size = max(1, PERMUTATION_BATCH_ELEMENTS // n)
+    rows = np.broadcast_to(zy, (min(batch_size, n_permutations), n))
+    # 允许浮点舍入误差，避免与观测值相等的置换被漏计
+    threshold = abs(observed) - 1e-12
+
+    extreme = 0
+    done = 0
+    while done < n_permutations:
+        size = min(batch_size, n_permutations - done)
+        coefficients = rng.permuted(rows[:size], axis=1) @ zx
+        extreme += int(np.count_nonzero(np.abs(coefficients) >= threshold))
+        done += size
+    return extreme
+
+
+def _p_value_bounds(extreme, total):
+    """Clopper–Pearson 置信区间，用于判断 p 值是否已明确高于或低于 alpha"""
+    tail = (1 - EARLY_STOP_CONFIDENCE) / 2
+    lower = stats.beta.ppf(tail, extreme, total - extreme + 1) if extreme > 0 else 0.0
+    upper = stats.beta.ppf(1 - tail, extreme + 1, total - extreme) if extreme < total else 1.0
+    return lower, upper
+
+
+def _exact_test(zx, zy, observed):
+    """穷举全部置换，返回精确的双侧 p 值"""
+    n = len(zx)
+    threshold = abs(observed) - 1e-12
+    extreme = 0
+    total = 0
+    permutations = itertools.permutations(range(n))
+    while True:
+        block = np.array(list(itertools.islice(permutations, max(1, PERMUTATION_BATCH_ELEMENTS // n))))
+        if len(block) == 0:
+            break
+        extreme += int(np.count_nonzero(np.abs(zy[block] @ zx) >= threshold))
+        total += len(block)
+    return extreme / total, total
+
+
+def permutation_test_correlation(x, y, method='pearson', n_permutations=10_000, alpha=0.05,
+                                 n_jobs=None, seed=None):
+    """
+    相关系数的置换检验（双侧）
+
+    参数:
+    - x, y: 配对数据
+    - method: 'pearson' 或 'spearman'
+    - n_permutations: 最大置换次数
+    - alpha: 显著性水平；p 值明显高于或低于 alpha 时提前停止
+    - n_jobs: 并行进程数，默认使用全部CPU核心
+    - seed: 随机种子
+
+    返回:
+    - 包含观测相关系数、p 值、实际置换次数、是否精确、是否提前停止的字典；
+      任一列为常数时相关系数与 p 值均为 NaN
+    """
+    standardized = _standardize_pair(x, y, method)
+    if standardized is None:
+        return {'coefficient': np.nan, 'p_value': np.nan, 'permutations': 0,
+                'exact': False, 'stopped_early': False}
+    zx, zy = standardized
+    n = len(zx)
+    observed = float(np.clip(np.dot(zx, zy), -1.0, 1.0))
+    result = {'coefficient': observed, 'exact': False, 'stopped_early': False}
+
+    # 样本量很小时全部置换数有限，直接穷举得到精确 p 值
+    if n <= 10 and math.factorial(n) <= min(n_permutations, EXACT_PERMUTATION_LIMIT):
+        result['p_value'], result['permutations'] = _exact_test(zx, zy, observed)
+        result['exact'] = True
+        return result
+
+    seeds = iter(np.random.SeedSequence(seed).spawn(math.ceil(n_permutations / PERMUTATIONS_PER_TASK)))
+    tasks = [min(PERMUTATIONS_PER_TASK, n_permutations - start)
+             for start in range(0, n_permutations, PERMUTATIONS_PER_TASK)]
+    extreme = 0
+    total = 0
+
+    def should_stop():
+        lower, upper = _p_value_bounds(extreme, total)
+        return upper < alpha or lower > alpha
+
+    workers = n_jobs or os.cpu_count() or 1
+    if workers > 1 and len(tasks) > 1 and n_permutations * n >= PARALLEL_MIN_WORK:
+        executor = _get_executor(workers)
+        pending = {}
+        remaining = iter(tasks)
+
+        def submit_next():
+            size = next(remaining, None)
+            if size is not None:
+                future = executor.submit(_count_extreme_permutations, zx, zy, observed, size, next(seeds))
+                pending[future] = size
+
+        for _ in range(workers):
+            submit_next()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                total += pending.pop(future)
+                extreme += future.result()
+            if should_stop():
+                for future in pending:
+                    future.cancel()
+                result['stopped_early'] = total < n_permutations
+                break
+            for _ in done:
+                submit_next()
+    else:
+        for size in tasks:
+            extreme += _count_extreme_permutations(zx, zy, observed, size, next(seeds))
+            total += size
+            if should_stop():
+                result['stopped_early'] = total < n_permutations
+                break
+
+    # 加1修正：把观测数据本身视为一次置换，保证 p 值不为0
+    result['p_value'] = (extreme + 1) / (total + 1)
+    result['permutations'] = total
+    return result
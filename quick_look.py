@@ -0,0 +1,268 @@
+import io
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy import stats
+from data_processor import calculate_statistics, summarize_statistics
+
+
+# 快速预览的默认样本量
+QUICK_LOOK_SAMPLE_SIZE = 10_000
+# 不超过此大小的文件做一遍完整的蓄水池抽样；更大的文件按随机字节偏移抽取行
+QUICK_LOOK_FULL_SCAN_BYTES = 20 * 1024 * 1024
+# 蓄水池抽样时每次读取的行数
+QUICK_LOOK_CHUNK_SIZE = 200_000
+# 保留的后台精确计算任务数量上限，超出时淘汰最久未查询的已完成任务
+MAX_EXACT_JOBS = 64
+
+_exact_executor = ThreadPoolExecutor(max_workers=2)
+_exact_jobs = OrderedDict()
+_exact_jobs_lock = threading.Lock()
+
+
+def reservoir_sample_csv(path, sample_size=QUICK_LOOK_SAMPLE_SIZE, chunksize=QUICK_LOOK_CHUNK_SIZE, seed=None):
+    """
+    边读取CSV边做蓄水池抽样（单次扫描）
+
+    每行分配一个均匀随机键，始终保留键最小的 sample_size 行，
+    等价于从全部行中做不放回的简单随机抽样，内存占用与文件大小无关。
+
+    返回:
+    - (样本 DataFrame, 总行数)
+    """
+    rng = np.random.default_rng(seed)
+    sample = None
+    keys = np.empty(0)
+    total_rows = 0
+
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        total_rows += len(chunk)
+        chunk_keys = rng.random(len(chunk))
+        if sample is None:
+            sample, keys = chunk, chunk_keys
+        else:
+            sample = pd.concat([sample, chunk], ignore_index=True)
+            keys = np.concatenate([keys, chunk_keys])
+        if len(sample) > sample_size:
+            keep = np.argpartition(keys, sample_size)[:sample_size]
+            sample, keys = sample.iloc[keep].reset_index(drop=True), keys[keep]
+
+    if sample is None:
+        sample = pd.read_csv(path, nrows=0)
+    return sample, total_rows
+
+
+def sample_csv_offsets(path, sample_size=QUICK_LOOK_SAMPLE_SIZE, seed=None):
+    """
+    按随机字节偏移从大文件中抽取行，耗时只与样本量有关，与文件大小无关
+
+    在数据区随机选取字节位置，跳到其后的下一个完整行读取。每行被选中的概率
+    与前一行的长度成正比，对行长相近的数值型CSV近似为有放回的等概率抽样。
+    要求字段内不含换行符。
+
+    返回:
+    - (样本 DataFrame, 估计的总行数)
+    """
+    rng = np.random.default_rng(seed)
+    size = os.path.getsize(path)
+    lines = []
+    with open(path, 'rb') as f:
+        header = f.readline()
+        data_start = f.tell()
+        if data_start >= size:
+            return pd.read_csv(path, nrows=0), 0
+
+        # 偏移从表头末尾的换行符开始取，使第一行数据也有机会被选中
+        for offset in np.sort(rng.integers(data_start - 1, size, sample_size)):
+            f.seek(offset)
+            f.readline()
+            line = f.readline()
+            if line.strip():
+                lines.append(line if line.endswith(b'\n') else line + b'\n')
+
+    sample = pd.read_csv(io.BytesIO(header + b''.join(lines)))
+    mean_line_length = np.mean([len(line) for line in lines]) if lines else 1
+    return sample, int(round((size - data_start) / mean_line_length))
+
+
+def quick_look_sample(path, sample_size=QUICK_LOOK_SAMPLE_SIZE, seed=None):
+    """
+    为快速预览抽取样本：小文件完整扫描一遍做蓄水池抽样，大文件按随机偏移抽样
+
+    返回:
+    - (样本 DataFrame, 总行数（大文件为估计值）, 是否为精确行数)；
+      精确行数同时表示样本为不放回抽样，否则为有放回抽样
+    """
+    if os.path.getsize(path) <= QUICK_LOOK_FULL_SCAN_BYTES:
+        sample, total_rows = reservoir_sample_csv(path, sample_size, seed=seed)
+        return sample, total_rows, True
+    sample, total_rows = sample_csv_offsets(path, sample_size, seed)
+    if total_rows <= sample_size:
+        # 样本量不小于估计的总行数时，有放回抽样会重复抽到同一行；改为完整扫描，结果即为精确值
+        sample, total_rows = reservoir_sample_csv(path, sample_size, seed=seed)
+        return sample, total_rows, True
+    return sample, total_rows, False
+
+
+def _quantile_interval(sorted_values, q, z):
+    """
+    分位数的无分布置信区间：以样本秩 n·q ± z·sqrt(n·q(1-q)) 处的次序统计量为界
+
+    返回:
+    - (下界, 上界, 秩误差占比)
+    """
+    n = len(sorted_values)
+    rank_error = z * np.sqrt(q * (1 - q) / n)
+    lower = sorted_values[max(int(np.floor(n * (q - rank_error))), 0)]
+    upper = sorted_values[min(int(np.ceil(n * (q + rank_error))), n - 1)]
+    return lower, upper, rank_error
+
+
+def format_quick_look(data, total_rows, exact_rows, column, confidence_level=0.95, with_replacement=False,
+                      sample_rows=None):
+    """
+    在样本上计算描述性统计量，并为每个估计给出误差界
+
+    参数:
+    - data: 某一列的样本数据（已去除缺失值）
+    - total_rows: 文件总行数（或估计值），用于有限总体校正
+    - exact_rows: total_rows 是否为精确值
+    - column: 列名
+    - confidence_level: 误差界的置信水平
+    - with_replacement: 样本是否为有放回抽样（按字节偏移抽样）；有放回时不做有限总体校正
+    - sample_rows: 抽到的行数（含该列缺失的行），默认为 len(data)；抽样比例按行数计算，
+      因为 total_rows 也包含缺失行
+
+    返回:
+    - 快速预览结果的Markdown文本
+    """
+    data = np.sort(np.asarray(data, dtype=float))
+    n = len(data)
+    if n < 2:
+        return "样本量不足，无法给出快速预览（至少需要2个观测值）"
+
+    summary = summarize_statistics(data)
+    z = stats.norm.ppf(1 - (1 - confidence_level) / 2)
+    # 有限总体校正只适用于不放回抽样；有放回抽样的样本即使覆盖全部行数也不是精确结果
+    sample_rows = n if sample_rows is None else sample_rows
+    if with_replacement:
+        fpc = 1.0
+    else:
+        fpc = np.sqrt(max(1 - sample_rows / total_rows, 0.0)) if total_rows > sample_rows else 0.0
+
+    std_unbiased = np.std(data, ddof=1)
+    mean_margin = z * std_unbiased / np.sqrt(n) * fpc
+    std_margin = z * std_unbiased / np.sqrt(2 * (n - 1)) * fpc
+    skew_margin = z * np.sqrt(6.0 / n) * fpc
+    kurt_margin = z * np.sqrt(24.0 / n) * fpc
+    outlier_rate = summary['outlier_count'] / n
+    outlier_margin = z * np.sqrt(outlier_rate * (1 - outlier_rate) / n) * fpc
+
+    def quantile_row(label, q, estimate):
+        if fpc == 0:
+            return f"| {label} | {estimate:.4f} | 精确 |"
+        lower, upper, rank_error = _quantile_interval(data, q, z)
+        return f"| {label} | {estimate:.4f} | [{lower:.4f}, {upper:.4f}]（秩误差 ±{rank_error * 100:.2f}%） |"
+
+    rows_label = f"{total_rows}" if exact_rows else f"约 {total_rows}"
+    result = f"""### 快速预览：{column}（样本 {n} / 总行数 {rows_label}）
+
+| 统计量 | 估计值 | {confidence_level*100:.0f}% 误差界 |
+|--------|------|------|
+| 均值 | {summary['mean']:.4f} | ±{mean_margin:.4f} |
+| 标准差 | {summary['std']:.4f} | ±{std_margin:.4f} |
+{quantile_row('第一四分位数 (Q1)', 0.25, summary['q1'])}
+{quantile_row('中位数', 0.5, summary['median'])}
+{quantile_row('第三四分位数 (Q3)', 0.75, summary['q3'])}
+| 最小值（样本内） | {summary['min']:.4f} | - |
+| 最大值（样本内） | {summary['max']:.4f} | - |
+| 偏度 | {summary['skewness']:.4f} | ±{skew_margin:.4f} |
+| 峰度 | {summary['kurtosis']:.4f} | ±{kurt_margin:.4f} |
+| 异常值比例 | {outlier_rate * 100:.2f}% | ±{outlier_margin * 100:.2f}% |
+
+### 说明
+- 结果基于随机样本，误差界为近似的 {confidence_level*100:.0f}% 置信范围；均值使用标准误，分位数使用秩误差对应的样本次序统计量
+- 样本覆盖全部数据时误差界为0，结果与精确计算一致
+- 需要精确结果时可点击"后台计算精确结果"，计算在后台进行，完成后点击"查看精确结果"
+"""
+    return result
+
+
+def format_quick_look_correlation(x, y, col_x, col_y, confidence_level=0.95):
+    """样本相关系数及其 Fisher z 变换置信区间"""
+    complete = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[complete], y[complete]
+    n = len(x)
+    if n < 4:
+        return ""
+    r = np.corrcoef(x, y)[0, 1]
+    z = stats.norm.ppf(1 - (1 - confidence_level) / 2)
+    center = np.arctanh(np.clip(r, -0.999999, 0.999999))
+    lower, upper = np.tanh(center - z / np.sqrt(n - 3)), np.tanh(center + z / np.sqrt(n - 3))
+    return f"""
+### 样本相关性：{col_x} 与 {col_y}
+
+| 指标 | 数值 |
+|------|------|
+| Pearson 相关系数 | {r:.4f} |
+| {confidence_level*100:.0f}% 置信区间 | [{lower:.4f}, {upper:.4f}] |
+"""
+
+
+def _exact_analysis(path, columns):
+    """后台任务：只读取需要的列，完整计算描述性统计量与相关系数"""
+    df = pd.read_csv(path, usecols=columns).apply(pd.to_numeric, errors='coerce')
+    result = calculate_statistics(df[columns[0]].dropna().values)
+    if len(columns) > 1:
+        # 精确结果只需要相关系数，不绘制全量散点图
+        aligned = df[columns[:2]].dropna()
+        if len(aligned) >= 3:
+            corr_coef, p_value = stats.pearsonr(aligned.iloc[:, 0], aligned.iloc[:, 1])
+            result += f"""
+
+### 相关性：{columns[0]} 与 {columns[1]}
+
+| 指标 | 数值 |
+|------|------|
+| 样本数 | {len(aligned)} |
+| Pearson 相关系数 | {corr_coef:.4f} |
+| p 值 | {p_value:.4f} |
+"""
+    return result
+
+
+def start_exact_analysis(path, columns):
+    """提交后台精确计算任务，返回任务ID"""
+    job_id = uuid.uuid4().hex
+    with _exact_jobs_lock:
+        _exact_jobs[job_id] = _exact_executor.submit(_exact_analysis, path, list(columns))
+        # 按最近查询顺序淘汰已完成的任务；仍在运行的任务不淘汰
+        finished = [key for key, future in _exact_jobs.items() if future.done()]
+        for key in finished[:max(len(_exact_jobs) - MAX_EXACT_JOBS, 0)]:
+            del _exact_jobs[key]
+    return job_id
+
+
+def get_exact_result(job_id):
+    """
+    查询后台精确计算任务
+
+    返回:
+    - (状态, 结果Markdown)，状态为 'running'、'done'、'failed' 或 'missing'（任务不存在或已被淘汰）
+    """
+    with _exact_jobs_lock:
+        future = _exact_jobs.get(job_id)
+        if future is not None:
+            _exact_jobs.move_to_end(job_id)
+    if future is None:
+        return 'missing', None
+    if not future.done():
+        return 'running', None
+    try:
+        return 'done', future.result()
+    except Exception as e:
+        return 'failed', str(e)
@@ -0,0 +1,185 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import Image
+
+
+# 支持的图片格式
+RENDER_FORMATS = ('png', 'webp')
+# 默认渲染参数，可通过环境变量调整
+DEFAULT_RENDER_FORMAT = os.getenv("STATEASE_RENDER_FORMAT", "png").lower()
+DEFAULT_RENDER_DPI = int(os.getenv("STATEASE_RENDER_DPI", "100"))
+# 缩略图的最大边长（像素）
+THUMBNAIL_MAX_SIZE = 320
+# 内存中最多缓存的渲染结果数
+RENDER_CACHE_SIZE = 256
+# 渲染结果的磁盘缓存目录，可通过环境变量 STATEASE_RENDER_DIR 指定
+DEFAULT_RENDER_DIR = os.getenv(
+    "STATEASE_RENDER_DIR", os.path.join(tempfile.gettempdir(), "statease_render")
+)
+# WebP 有损压缩质量
+WEBP_QUALITY = 90
+
+
+def data_digest(*arrays):
+    """由数组内容计算短哈希，作为缓存键的一部分（内容相同的数据得到相同的键）"""
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype}{array.shape}".encode())
+        digest.update(memoryview(array).cast('B'))
+    return digest.hexdigest()[:32]
+
+
+def _encode(image, fmt):
+    """把 PIL 图像编码为 PNG 或 WebP 字节"""
+    buffer = io.BytesIO()
+    if fmt == 'webp':
+        image.save(buffer, format='WEBP', quality=WEBP_QUALITY, method=4)
+    else:
+        image.save(buffer, format='PNG', compress_level=6)
+    return buffer.getvalue()
+
+
+def rasterize_figure(fig, dpi=DEFAULT_RENDER_DPI, size=None):
+    """
+    直接用 Agg 画布把图表栅格化为 RGB 图像，并释放图表
+
+    参数:
+    - fig: matplotlib 图表
+    - dpi: 渲染分辨率
+    - size: 输出尺寸 (宽, 高)，单位为像素；不提供时按图表自身尺寸与 dpi 计算
+
+    返回:
+    - PIL RGB 图像
+    """
+    try:
+        if size is not None:
+            fig.set_size_inches(size[0] / dpi, size[1] / dpi)
+        fig.set_dpi(dpi)
+        canvas = FigureCanvasAgg(fig)
+        canvas.draw()
+        return Image.fromarray(np.asarray(canvas.buffer_rgba())).convert('RGB')
+    finally:
+        plt.close(fig)
+
+
+def render_figure(fig, fmt=DEFAULT_RENDER_FORMAT, dpi=DEFAULT_RENDER_DPI, size=None):
+    """把图表渲染为 PNG 或 WebP 字节并释放图表"""
+    if fmt not in RENDER_FORMATS:
+        raise ValueError(f"不支持的图片格式: {fmt}。可选: {', '.join(RENDER_FORMATS)}")
+    return _encode(rasterize_figure(fig, dpi, size), fmt)
+
+
+def make_thumbnail(image, fmt=DEFAULT_RENDER_FORMAT, max_size=THUMBNAIL_MAX_SIZE):
+    """由已栅格化的图像缩放得到缩略图字节，不重新绘制图表"""
+    thumbnail = image.copy()
+    thumbnail.thumbnail((max_size, max_size), Image.LANCZOS)
+    return _encode(thumbnail, fmt)
+
+
+class RenderCache:
+    """
+    图表渲染缓存
+
+    - 以 (分析键, 格式, dpi, 尺寸) 为键，缓存编码后的完整图片与缩略图
+    - 图片同时写入磁盘缓存目录，返回的文件路径可直接交给 gr.Image 显示
+    - 按最近最少使用（LRU）淘汰，淘汰时删除对应文件
+    - 命中缓存时不调用绘图函数，重复查看与示例数据只需一次查表
+    """
+
+    def __init__(self, root=DEFAULT_RENDER_DIR, max_entries=RENDER_CACHE_SIZE):
+        self.root = root
+        self.max_entries = max_entries
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def _file_stem(self, cache_key):
+        return hashlib.sha256(repr(cache_key).encode('utf-8')).hexdigest()[:32]
+
+    def get(self, key, fmt=DEFAULT_RENDER_FORMAT, dpi=DEFAULT_RENDER_DPI, size=None):
+        """查询缓存，未命中时返回 None"""
+        cache_key = (key, fmt, dpi, tuple(size) if size is not None else None)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+            return entry
+
+    def render(self, key, figure, fmt=DEFAULT_RENDER_FORMAT, dpi=DEFAULT_RENDER_DPI, size=None):
+        """
+        获取图表的渲染结果，未命中缓存时才绘制并编码
+
+        参数:
+        - key: 分析键，需能唯一确定图表内容（例如数据哈希、列名与分析参数组成的元组）
+        - figure: matplotlib 图表，或返回图表的无参函数（命中缓存时不会被调用）；
+          传入已绘制的图表时，命中缓存后该图表会被直接释放
+        - fmt: 'png' 或 'webp'
+        - dpi: 渲染分辨率
+        - size: 输出尺寸 (宽, 高)，单位为像素
+
+        返回:
+        - 字典，包含 image、thumbnail（编码后的字节）、path、thumbnail_path（磁盘文件路径）与 format
+        """
+        if fmt not in RENDER_FORMATS:
+            raise ValueError(f"不支持的图片格式: {fmt}。可选: {', '.join(RENDER_FORMATS)}")
+        entry = self.get(key, fmt, dpi, size)
+        if entry is not None:
+            if not callable(figure):
+                plt.close(figure)
+            return entry
+
+        fig = figure() if callable(figure) else figure
+        image = rasterize_figure(fig, dpi, size)
+        cache_key = (key, fmt, dpi, tuple(size) if size is not None else None)
+        stem = self._file_stem(cache_key)
+        entry = {
+            'format': fmt,
+            'image': _encode(image, fmt),
+            'thumbnail': make_thumbnail(image, fmt),
+            'path': os.path.join(self.root, f"{stem}.{fmt}"),
+            'thumbnail_path': os.path.join(self.root, f"{stem}_thumb.{fmt}"),
+        }
+        for path, content in ((entry['path'], entry['image']), (entry['thumbnail_path'], entry['thumbnail'])):
+            with open(path, 'wb') as f:
+                f.write(content)
+
+        with self._lock:
+            self._entries[cache_key] = entry
+            self._entries.move_to_end(cache_key)
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[1])
+        for old in evicted:
+            for path in (old['path'], old['thumbnail_path']):
+                if os.path.exists(path):
+                    os.remove(path)
+        return entry
+
+    def clear(self):
+        """清空缓存并删除全部缓存文件"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            for path in (entry['path'], entry['thumbnail_path']):
+                if os.path.exists(path):
+                    os.remove(path)
+
+
+# 全局共享的渲染缓存
+render_cache = RenderCache()
+
+
+def render_image_path(key, figure, fmt=DEFAULT_RENDER_FORMAT, dpi=DEFAULT_RENDER_DPI, size=None):
+    """渲染（或从缓存读取）图表并返回图片文件路径，供 gr.Image 显示；figure 为 None 时返回 None"""
+    if figure is None:
+        return None
+    return render_cache.render(key, figure, fmt, dpi, size)['path']
@@ -0,0 +1,279 @@
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+# 导入中文字体配置
+import font_config
+from histogram_binning import HistogramAccumulator
+
+
+# 流式处理时每块的数据点数量
+ROLLING_CHUNK_SIZE = 100_000
+# 滚动图中保留的最大分桶数量（抽稀后的绘图点数）
+PLOT_MAX_POINTS = 2000
+# 值分布直方图的最大bin数量
+HISTOGRAM_MAX_BINS = 200
+
+ROLLING_COLUMNS = ['value', 'mean', 'std', 'skew', 'q1', 'median', 'q3', 'outlier']
+
+
+def _windowed_power_sums(values, window):
+    """
+    计算每个完整窗口的一至三阶原点矩（相对局部锚点）
+
+    全局累加幂和在带趋势的数据上会累积很大的数值，相减时丢失精度。这里把数据按
+    窗口长度分段，每段只在覆盖其窗口所需的 2×window-1 个点上累加，并以该段均值为
+    锚点平移，累加值始终与窗口内的波动处于同一量级；整个计算仍为向量化的 O(n)。
+
+    返回:
+    - (s1, s2, s3, anchor)，长度均为 len(values)-window+1，对应以各位置开始的窗口
+    """
+    n_windows = len(values) - window + 1
+    n_blocks = -(-n_windows // window)
+    span = 2 * window - 1
+    padded = np.concatenate([values, np.full(n_blocks * window + span - window - len(values), np.nan)])
+    segments = np.lib.stride_tricks.sliding_window_view(padded, span)[::window][:n_blocks]
+    anchor = np.nanmean(segments, axis=1, keepdims=True)
+    y = segments - anchor
+
+    sums = []
+    for power in (1, 2, 3):
+        cumulative = np.zeros((n_blocks, span + 1))
+        np.cumsum(y ** power, axis=1, out=cumulative[:, 1:])
+        sums.append(((cumulative[:, window:] - cumulative[:, :window]) / window).ravel()[:n_windows])
+    anchor = np.repeat(anchor.ravel(), window)[:n_windows]
+    return sums[0], sums[1], sums[2], anchor
+
+
+def _rolling_block(values, window):
+    """
+    计算一段连续数据上的滚动统计量
+
+    均值、标准差与偏度由累加幂和的差分得到，每一步为 O(1)；
+    分位数使用 pandas 的滚动分位数（基于跳表的有序结构，每步 O(log w)）。
+    前 window-1 个位置窗口未填满，统计量为 NaN。
+    """
+    n = len(values)
+    result = {name: np.full(n, np.nan) for name in ROLLING_COLUMNS}
+    result['value'] = values
+    result['outlier'] = np.zeros(n, dtype=bool)
+    if n < window:
+        return pd.DataFrame(result)
+
+    s1, s2, s3, anchor = _windowed_power_sums(values, window)
+
+    # 由原点矩换算为中心矩（与 np.std、stats.skew 的有偏估计一致）；
+    # 相对 s2 可忽略的 m2 视为舍入误差，即窗口内为常数
+    m2 = s2 - s1 ** 2
+    m2 = np.where(m2 > 1e-12 * s2, m2, 0.0)
+    m3 = s3 - 3 * s1 * s2 + 2 * s1 ** 3
+    with np.errstate(divide='ignore', invalid='ignore'):
+        skew = np.where(m2 > 0, m3 / m2 ** 1.5, 0.0)
+
+    start = window - 1
+    result['mean'][start:] = s1 + anchor
+    result['std'][start:] = np.sqrt(m2)
+    result['skew'][start:] = skew
+
+    rolling = pd.Series(values).rolling(window)
+    q1 = rolling.quantile(0.25).to_numpy()
+    q3 = rolling.quantile(0.75).to_numpy()
+    result['q1'] = q1
+    result['median'] = rolling.median().to_numpy()
+    result['q3'] = q3
+
+    # 按 1.5×IQR 规则标记当前点相对其所在窗口是否异常
+    iqr = q3 - q1
+    with np.errstate(invalid='ignore'):
+        result['outlier'] = (values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)
+
+    return pd.DataFrame(result)
+
+
+class RollingAccumulator:
+    """
+    流式滚动统计累加器
+
+    按块接收有序数据（缺失值与无穷值被丢弃），只保留上一块末尾 window-1 个点作为窗口重叠，
+    因此整个数据集只需扫描一遍，内存占用与数据总量无关。
+    """
+
+    def __init__(self, window):
+        if window < 2:
+            raise ValueError("窗口大小至少为2")
+        self.window = int(window)
+        self.position = 0  # 已处理的数据点数量
+        self._tail = np.empty(0)
+
+    def update(self, chunk):
+        """接收一块新数据，返回该块每个数据点对应的滚动统计量"""
+        chunk = np.asarray(chunk, dtype=float)
+        # 与缺失值一样丢弃 ±inf：一个无穷值会使所在分段的锚点变为非有限值，波及不含它的窗口
+        chunk = chunk[np.isfinite(chunk)]
+        if len(chunk) == 0:
+            return pd.DataFrame(columns=ROLLING_COLUMNS)
+
+        values = np.concatenate([self._tail, chunk])
+        frame = _rolling_block(values, self.window).iloc[len(self._tail):]
+        frame.index = np.arange(self.position, self.position + len(chunk))
+
+        self._tail = values[-(self.window - 1):]
+        self.position += len(chunk)
+        return frame
+
+
+class _EnvelopeDecimator:
+    """
+    流式抽稀器：把滚动结果按固定长度分桶，保留每桶的最小/最大值与均值
+
+    桶数量超过上限时相邻两桶合并、桶长加倍，因此无需预先知道数据总量。
+    """
+
+    def __init__(self, max_points=PLOT_MAX_POINTS):
+        self.max_points = max_points
+        self.bucket_size = 1
+        self.buckets = None
+
+    @staticmethod
+    def _regroup(frame, bucket_size):
+        return frame.groupby(frame['start'] // bucket_size).agg({
+            'start': 'min', 'count': 'sum', 'vmin': 'min', 'vmax': 'max',
+            'msum': 'sum', 'mcount': 'sum', 'omin': 'min', 'omax': 'max'
+        })
+
+    def update(self, frame):
+        if frame.empty:
+            return
+        means = frame['mean'].to_numpy()
+        outliers = frame['outlier'].to_numpy(dtype=bool)
+        values = frame['value'].to_numpy()
+        points = pd.DataFrame({
+            'start': frame.index.to_numpy(),
+            'count': 1,
+            'vmin': values,
+            'vmax': values,
+            'msum': np.nan_to_num(means),
+            'mcount': (~np.isnan(means)).astype(int),
+            'omin': np.where(outliers, values, np.nan),
+            'omax': np.where(outliers, values, np.nan),
+        })
+        chunk_buckets = self._regroup(points, self.bucket_size)
+        if self.buckets is not None:
+            chunk_buckets = self._regroup(pd.concat([self.buckets, chunk_buckets]), self.bucket_size)
+
+        while len(chunk_buckets) > self.max_points:
+            self.bucket_size *= 2
+            chunk_buckets = self._regroup(chunk_buckets, self.bucket_size)
+        self.buckets = chunk_buckets.reset_index(drop=True)
+
+
+def calculate_rolling_statistics(data, window, chunk_size=ROLLING_CHUNK_SIZE):
+    """
+    计算有序数据的滚动统计量
+
+    参数:
+    - data: 按时间顺序排列的数据数组
+    - window: 窗口大小（数据点个数）
+    - chunk_size: 每次处理的数据块大小
+
+    返回:
+    - 每个数据点对应的滚动均值、标准差、偏度、四分位数及异常值标记 (DataFrame)
+    """
+    accumulator = RollingAccumulator(window)
+    frames = [accumulator.update(data[i:i + chunk_size]) for i in range(0, len(data), chunk_size)]
+    if not frames:
+        return pd.DataFrame(columns=ROLLING_COLUMNS)
+    return pd.concat(frames)
+
+
+def generate_rolling_plot(buckets, window, title="数据序列"):
+    """根据抽稀后的分桶结果生成滚动统计时序图"""
+    fig, ax = plt.subplots(figsize=(10, 5))
+
+    x = buckets['start'] + (buckets['count'] - 1) / 2
+    ax.fill_between(x, buckets['vmin'], buckets['vmax'], color='#5B9BD5', alpha=0.35,
+                    linewidth=0, label='原始值范围')
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rolling_mean = buckets['msum'] / buckets['mcount'].replace(0, np.nan)
+    ax.plot(x, rolling_mean, color='#D9534F', linewidth=1.5, label=f'滚动均值 (窗口={window})')
+
+    has_outlier = buckets['omax'].notna()
+    if has_outlier.any():
+        outlier_x = np.concatenate([x[has_outlier], x[has_outlier]])
+        outlier_y = np.concatenate([buckets['omin'][has_outlier], buckets['omax'][has_outlier]])
+        ax.scatter(outlier_x, outlier_y, s=12, color='#333333', zorder=3, label='滚动异常值')
+
+    ax.set_title(f'{title}的滚动统计', fontsize=14)
+    ax.set_xlabel('序号', fontsize=12)
+    ax.set_ylabel('值', fontsize=12)
+    ax.legend()
+    ax.grid(True, alpha=0.3)
+
+    plt.tight_layout()
+    return fig
+
+
+def analyze_rolling(chunks, window, title="数据序列", max_points=PLOT_MAX_POINTS):
+    """
+    对分块到达的有序数据做一次流式滚动分析
+
+    参数:
+    - chunks: 数据块的可迭代对象（例如 pd.read_csv(chunksize=...) 逐块取出的列）
+    - window: 窗口大小（数据点个数）
+    - title: 图表标题
+    - max_points: 时序图抽稀后的最大分桶数量
+
+    返回:
+    - (滚动统计结果的Markdown文本, 抽稀后的分桶结果, 值分布直方图累加器)；
+      图表由调用方按需用 generate_rolling_plot 与 generate_histogram_from_counts 绘制，
+      命中渲染缓存时不需要绘图。有效数据不足时后两项为 None
+    """
+    accumulator = RollingAccumulator(window)
+    decimator = _EnvelopeDecimator(max_points)
+    # 值分布直方图在同一遍扫描中逐块累加，不需要再次读取数据
+    histogram = HistogramAccumulator(HISTOGRAM_MAX_BINS)
+    outlier_count = 0
+    last = None
+    mean_range = [np.inf, -np.inf]
+    std_max = -np.inf
+
+    for chunk in chunks:
+        frame = accumulator.update(chunk)
+        if frame.empty:
+            continue
+        decimator.update(frame)
+        histogram.update(frame['value'].to_numpy())
+        outlier_count += int(frame['outlier'].sum())
+        valid = frame.dropna(subset=['mean'])
+        if not valid.empty:
+            last = valid.iloc[-1]
+            mean_range[0] = min(mean_range[0], valid['mean'].min())
+            mean_range[1] = max(mean_range[1], valid['mean'].max())
+            std_max = max(std_max, valid['std'].max())
+
+    if last is None:
+        return f"有效数据点不足，至少需要{accumulator.window}个观测值才能形成一个完整窗口", None, None
+
+    result = f"""### 滚动统计结果 (窗口大小: {accumulator.window})
+
+| 统计量 | 值 |
+|--------|----|
+| 数据点数 | {accumulator.position} |
+| 最新窗口均值 | {last['mean']:.4f} |
+| 最新窗口标准差 | {last['std']:.4f} |
+| 最新窗口偏度 | {last['skew']:.4f} |
+| 最新窗口 Q1 | {last['q1']:.4f} |
+| 最新窗口中位数 | {last['median']:.4f} |
+| 最新窗口 Q3 | {last['q3']:.4f} |
+| 滚动均值范围 | {mean_range[0]:.4f} ~ {mean_range[1]:.4f} |
+| 滚动标准差最大值 | {std_max:.4f} |
+| 滚动异常值数量 | {outlier_count} |
+
+### 解读
+- 每个数据点的统计量均基于以该点结尾的最近 {accumulator.window} 个观测值
+- 异常值按窗口内 1.5×IQR 规则判定，反映的是相对近期水平的突变
+- 时序图已抽稀为每桶 {decimator.bucket_size} 个点，阴影为桶内原始值范围
+- 值分布直方图在同一遍扫描中逐块累加（{len(histogram.counts)} 个bin），反映整个序列的分布
+"""
+
+    return result, decimator.buckets, histogram
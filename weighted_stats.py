@@ -0,0 +1,127 @@
+import numpy as np
+
+
+# 权重类型：frequency 为频数（每个取值出现的次数），sampling 为抽样权重
+WEIGHT_TYPES = ('frequency', 'sampling')
+
+
+def valid_weighted_rows(values, counts):
+    """丢弃缺失值和非正频数的行，不合并相同的值（保留原始权重，用于计算有效样本量）"""
+    values = np.asarray(values, dtype=float)
+    counts = np.asarray(counts, dtype=float)
+    valid = ~(np.isnan(values) | np.isnan(counts)) & (counts > 0)
+    return values[valid], counts[valid]
+
+
+def compress_frequency_table(values, counts):
+    """
+    把 (值, 频数) 表整理为按值排序、值互不相同的压缩表示
+
+    缺失值和非正频数会被丢弃，相同的值合并频数。合并会改变 Σw²，
+    因此抽样权重的 Kish 有效样本量须在压缩前由原始权重计算。
+
+    返回:
+    - (values, counts)：递增的不同取值及其总频数
+    """
+    values, counts = valid_weighted_rows(values, counts)
+    unique_values, inverse = np.unique(values, return_inverse=True)
+    totals = np.bincount(inverse, weights=counts, minlength=len(unique_values))
+    return unique_values, totals
+
+
+def effective_sample_size(weights, weight_type='frequency'):
+    """
+    计算加权数据的样本量
+
+    参数:
+    - weights: 每个观测的权重
+    - weight_type: 'frequency' 时权重为频数（可以不是整数），样本量即总频数 Σw；
+      'sampling' 时为抽样权重，使用 Kish 有效样本量 (Σw)² / Σw²，
+      此时 weights 须为每个观测的原始权重，不能是合并相同取值后的频数
+    """
+    if weight_type not in WEIGHT_TYPES:
+        raise ValueError(f"不支持的权重类型: {weight_type}。可选: {', '.join(WEIGHT_TYPES)}")
+    weights = np.asarray(weights, dtype=float)
+    total = weights.sum()
+    if weight_type == 'frequency':
+        return total
+    return total ** 2 / np.sum(weights ** 2)
+
+
+def weighted_quantile(values, weights, q):
+    """
+    计算加权分位数
+
+    values 须为递增排列（compress_frequency_table 的输出即满足）。
+    对整数频数，结果与把数据展开后调用 np.percentile（线性插值）完全一致，
+    但只需在累计频数上做二分查找，计算量与不同取值的个数成正比。
+
+    参数:
+    - values: 递增的取值
+    - weights: 对应的频数/权重
+    - q: 分位点（0~1 之间的数或数组）
+    """
+    cumulative = np.cumsum(weights)
+    position = (cumulative[-1] - 1) * np.asarray(q, dtype=float)
+    lower = np.floor(position)
+    fraction = position - lower
+
+    def value_at_rank(rank):
+        # 第 rank 个（从0开始）展开数据所对应的取值
+        index = np.searchsorted(cumulative, rank, side='right')
+        return values[np.minimum(index, len(values) - 1)]
+
+    lower_value = value_at_rank(lower)
+    upper_value = value_at_rank(lower + 1)
+    return lower_value + fraction * (upper_value - lower_value)
+
+
+def weighted_moments(values, weights):
+    """
+    计算加权均值与二、三、四阶中心矩（有偏估计，与展开后的 np.std、stats.skew 一致）
+
+    返回:
+    - (mean, m2, m3, m4)
+    """
+    mean = np.average(values, weights=weights)
+    deviation = values - mean
+    m2 = np.average(deviation ** 2, weights=weights)
+    m3 = np.average(deviation ** 3, weights=weights)
+    m4 = np.average(deviation ** 4, weights=weights)
+    return mean, m2, m3, m4
+
+
+def summarize_weighted_statistics(values, weights, weight_type='frequency'):
+    """
+    直接在压缩表示上计算描述性统计量
+
+    返回与 summarize_statistics 相同字段的字典。count 为样本量：
+    频数表（weight_type='frequency'）为总频数 Σw，抽样权重（'sampling'）为 Kish 有效样本量。
+    """
+    # 样本量由原始权重计算；矩与分位数在合并相同取值后的压缩表示上计算
+    n = effective_sample_size(valid_weighted_rows(values, weights)[1], weight_type)
+    values, weights = compress_frequency_table(values, weights)
+
+    mean, m2, m3, m4 = weighted_moments(values, weights)
+    q1, median, q3 = weighted_quantile(values, weights, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+
+    # 检测异常值（按频数计数）
+    lower_bound = q1 - 1.5 * iqr
+    upper_bound = q3 + 1.5 * iqr
+    outlier_weight = weights[(values < lower_bound) | (values > upper_bound)].sum()
+
+    return {
+        'count': int(n) if n == round(n) else n,
+        'mean': mean,
+        'median': median,
+        'std': np.sqrt(m2),
+        'min': values[0],
+        'max': values[-1],
+        'q1': q1,
+        'q3': q3,
+        'iqr': iqr,
+        'skewness': m3 / m2 ** 1.5 if m2 > 0 else np.nan,
+        'kurtosis': m4 / m2 ** 2 - 3 if m2 > 0 else np.nan,
+        'outlier_count': int(round(outlier_weight)),
+    }